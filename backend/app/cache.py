@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Collection, Iterable, Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from .models import Site, SiteEstablishment
+
+# taille totale des corps conservés ; une liste d'établissements peut peser plusieurs Mo
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResponseCache:
+    """LRU en mémoire des corps JSON déjà sérialisés, une seule version (ETag) par URL.
+
+    Une nouvelle version remplace l'ancienne ; la taille est bornée en octets et non en
+    nombre d'entrées.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(url)
+            return entry[1]
+
+    def put(self, url: str, etag: str, body: bytes) -> None:
+        with self._lock:
+            previous = self._entries.pop(url, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            if len(body) > self.max_bytes:
+                return
+            self._entries[url] = (etag, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+response_cache = ResponseCache()
+
+
+def bump_site_version(session: Session, site_id: int) -> None:
+    """Invalide les réponses en cache d'un site ; à appeler dans la transaction de l'écriture."""
+    session.exec(
+        update(Site)
+        .where(Site.id == site_id)
+        .values(data_version=Site.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bump_establishment_sites(session: Session, establishment_ids: Collection[int]) -> None:
+    """Invalide tous les sites affichant l'un des établissements (stockage partagé entre sites)."""
+    if not establishment_ids:
+        return
+    member_sites = select(SiteEstablishment.site_id).where(
+        SiteEstablishment.establishment_id.in_(establishment_ids)
+    )
+    session.exec(
+        update(Site)
+        .where(Site.id.in_(member_sites))
+        .values(data_version=Site.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def site_etag(site: Site, resource: str) -> str:
+    return f'W/"{resource}-{site.id}-{site.data_version}"'
+
+
+def sites_etag(session: Session) -> str:
+    digest = hashlib.blake2b(digest_size=8)
+    for site_id, version in session.exec(select(Site.id, Site.data_version).order_by(Site.id)):
+        digest.update(f"{site_id}:{version};".encode())
+    return f'W/"sites-{digest.hexdigest()}"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates: Iterable[str] = (value.strip() for value in header.split(","))
+    return any(candidate in ("*", etag, etag.removeprefix("W/")) for candidate in candidates)
+
+
+def cached_json_response(request: Request, etag: str, build: Callable[[], bytes]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    url = str(request.url)
+    body = response_cache.get(url, etag)
+    if body is None:
+        body = build()
+        response_cache.put(url, etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
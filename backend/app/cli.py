@@ -3,11 +3,11 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import os
+from datetime import timedelta
 from getpass import getpass
 
-import uvicorn
-
 from .config import Settings
 
 
@@ -70,6 +70,94 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Active le rechargement automatique du serveur (utile en développement).",
     )
+
+    subparsers = parser.add_subparsers(dest="command")
+    sitemap = subparsers.add_parser(
+        "sitemap",
+        help="Génère les sitemaps gzip (fichiers de 50 000 URLs maximum) et leur index pour un site.",
+    )
+    sitemap.add_argument("site_id", type=int, help="Identifiant du site.")
+    sitemap.add_argument(
+        "--base-url",
+        dest="base_url",
+        required=True,
+        help="URL publique de l'annuaire (ex: https://plombiers-lyon.fr).",
+    )
+    sitemap.add_argument(
+        "--output-dir",
+        dest="output_dir",
+        default="./sitemaps",
+        help="Dossier de destination des fichiers (par défaut ./sitemaps).",
+    )
+    sitemap.add_argument(
+        "--include-closed",
+        dest="include_closed",
+        action="store_true",
+        help="Inclut les établissements fermés dans les sitemaps.",
+    )
+
+    export = subparsers.add_parser(
+        "export",
+        help="Exporte en flux les établissements d'un site au format CSV ou Parquet.",
+    )
+    export.add_argument("site_id", type=int, help="Identifiant du site.")
+    export.add_argument("output", help="Chemin du fichier à écrire.")
+    export.add_argument(
+        "--format",
+        dest="export_format",
+        choices=["csv", "parquet"],
+        default=None,
+        help="Format d'export (déduit de l'extension du fichier si omis).",
+    )
+    export.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        type=int,
+        default=5000,
+        help="Nombre de lignes lues par lot (par défaut 5000).",
+    )
+
+    archive = subparsers.add_parser(
+        "archive",
+        help="Déplace vers les tables d'archive les établissements fermés depuis longtemps.",
+    )
+    archive.add_argument(
+        "--closed-for-days",
+        dest="closed_for_days",
+        type=int,
+        default=None,
+        help="Ancienneté minimale de fermeture en jours (par défaut GENERATEUR_ARCHIVE_CLOSED_AFTER_DAYS, 365).",
+    )
+
+    subparsers.add_parser(
+        "migrate",
+        help="Crée les tables et index manquants (à lancer au déploiement avec GENERATEUR_DATABASE_AUTO_MIGRATE=false).",
+    )
+
+    schedule = subparsers.add_parser(
+        "schedule",
+        help="Rafraîchit automatiquement tous les sites en respectant le quota SIRENE (processus permanent).",
+    )
+    schedule.add_argument(
+        "--once",
+        action="store_true",
+        help="Effectue un seul passage puis s'arrête (pour un déclenchement par cron).",
+    )
+
+    communes = subparsers.add_parser(
+        "communes",
+        help="Construit le référentiel local des communes (noms, départements, codes postaux, centres).",
+    )
+    communes.add_argument(
+        "--source",
+        default=None,
+        help="URL ou fichier JSON au format geo.api.gouv.fr (par défaut l'API Découpage administratif).",
+    )
+    communes.add_argument(
+        "--output",
+        default=None,
+        help="Fichier à écrire (par défaut GENERATEUR_COMMUNE_REFERENTIAL_PATH, ./data/communes.bin).",
+    )
     return parser
 
 
@@ -110,11 +198,115 @@ def apply_runtime_settings(arguments: argparse.Namespace) -> None:
     _set_env_if_provided("GENERATEUR_OPENAI_API_KEY", openai_api_key)
 
 
+def run_sitemap(arguments: argparse.Namespace) -> None:
+    _set_env_if_provided("GENERATEUR_DATABASE_URL", arguments.database_url)
+
+    # imports différés : la configuration de la base doit être appliquée avant la création du moteur
+    from .database import get_session
+    from .services.sitemap import SitemapGenerator
+
+    with get_session() as session:
+        generator = SitemapGenerator(
+            session,
+            base_url=arguments.base_url,
+            output_dir=arguments.output_dir,
+            include_closed=arguments.include_closed,
+        )
+        index_path = generator.generate(arguments.site_id)
+    print(f"{generator.total_urls} URLs réparties dans {len(generator.shards)} fichier(s), index : {index_path}")
+
+
+def run_export(arguments: argparse.Namespace) -> None:
+    _set_env_if_provided("GENERATEUR_DATABASE_URL", arguments.database_url)
+
+    from .database import get_session
+    from .services.export import EstablishmentExporter
+
+    export_format = arguments.export_format or ("parquet" if arguments.output.endswith(".parquet") else "csv")
+    with get_session() as session:
+        exporter = EstablishmentExporter(session, arguments.site_id, batch_size=arguments.batch_size)
+        if export_format == "parquet":
+            count = exporter.write_parquet(arguments.output)
+        else:
+            count = exporter.write_csv(arguments.output)
+    print(f"{count} établissements exportés vers {arguments.output}")
+
+
+def run_archive(arguments: argparse.Namespace) -> None:
+    _set_env_if_provided("GENERATEUR_DATABASE_URL", arguments.database_url)
+
+    from .database import get_session, init_db
+    from .services.archive import archive_closed_establishments
+
+    init_db()
+    days = arguments.closed_for_days
+    if days is None:
+        days = Settings().archive_closed_after_days
+    with get_session() as session:
+        count = archive_closed_establishments(session, timedelta(days=days))
+    print(f"{count} établissements fermés depuis plus de {days} jours archivés")
+
+
+def run_migrate(arguments: argparse.Namespace) -> None:
+    _set_env_if_provided("GENERATEUR_DATABASE_URL", arguments.database_url)
+
+    from .database import init_db
+
+    try:
+        changes = init_db()
+    except RuntimeError as exc:
+        raise SystemExit(f"Migration incomplète : {exc}") from exc
+    for change in changes:
+        print(change)
+    print("Schéma de la base à jour")
+
+
+def run_schedule(arguments: argparse.Namespace) -> None:
+    _set_env_if_provided("GENERATEUR_DATABASE_URL", arguments.database_url)
+    _set_env_if_provided("GENERATEUR_SIRENE_API_KEY", arguments.sirene_api_key)
+    _set_env_if_provided("GENERATEUR_SIRENE_OAUTH_CLIENT_ID", arguments.sirene_oauth_client_id)
+    _set_env_if_provided("GENERATEUR_SIRENE_OAUTH_CLIENT_SECRET", arguments.sirene_oauth_client_secret)
+
+    from .database import init_db
+    from .services.scheduler import run_scheduler
+
+    init_db()
+    asyncio.run(run_scheduler(once=arguments.once))
+
+
+def run_communes(arguments: argparse.Namespace) -> None:
+    from .services.communes import COMMUNES_SOURCE_URL, build_commune_referential, load_communes_source
+
+    output = arguments.output or Settings().commune_referential_path
+    count = build_commune_referential(load_communes_source(arguments.source or COMMUNES_SOURCE_URL), output)
+    print(f"{count} communes enregistrées dans {output}")
+
+
 def main(argv: list[str] | None = None) -> None:
     parser = build_parser()
     args = parser.parse_args(argv)
+    if args.command == "sitemap":
+        run_sitemap(args)
+        return
+    if args.command == "export":
+        run_export(args)
+        return
+    if args.command == "archive":
+        run_archive(args)
+        return
+    if args.command == "migrate":
+        run_migrate(args)
+        return
+    if args.command == "schedule":
+        run_schedule(args)
+        return
+    if args.command == "communes":
+        run_communes(args)
+        return
     apply_runtime_settings(args)
 
+    import uvicorn
+
     uvicorn.run("app.main:app", host=args.host, port=args.port, reload=args.reload)
 
 
@@ -7,6 +7,21 @@ class Settings(BaseSettings):
         default="sqlite:///./data/app.db",
         description="URL de connexion à la base de données",
     )
+    database_auto_migrate: bool = Field(
+        default=True,
+        description="Crée les tables et index manquants au démarrage de l'API (sinon `python -m app.cli migrate`)",
+    )
+    database_tuning: bool = Field(
+        default=True,
+        description="Applique le profil de production : WAL et pragmas SQLite, pool et COPY PostgreSQL",
+    )
+    database_pool_size: int = 10
+    database_max_overflow: int = 20
+    database_pool_recycle_seconds: int = 1800
+    sqlite_busy_timeout_ms: int = 30_000
+    sqlite_synchronous: str = Field(default="NORMAL", description="OFF|NORMAL|FULL ; NORMAL suffit en mode WAL")
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kb: int = 64 * 1024
     sirene_base_url: str = Field(
         default="https://api.insee.fr/entreprises/sirene/V3",
         description="Endpoint racine de l'API SIRENE",
@@ -18,8 +33,38 @@ class Settings(BaseSettings):
     sirene_oauth_client_secret: str | None = None
     sirene_rate_limit_per_minute: int = 30
     sirene_default_page_size: int = 1000
+    sirene_daily_quota: int | None = Field(
+        default=None,
+        description="Requêtes SIRENE par jour allouées aux imports (par défaut le débit par minute sur 24 h)",
+    )
+    refresh_interval_hours: float = Field(
+        default=24.0, description="Fraîcheur visée par le planificateur : intervalle entre deux imports d'un site"
+    )
+    scheduler_tick_seconds: int = Field(default=300, description="Délai entre deux passages du planificateur")
     openai_api_key: str | None = None
     ban_base_url: str = "https://api-adresse.data.gouv.fr"
+    commune_referential_path: str = Field(
+        default="./data/communes.bin",
+        description="Référentiel des communes construit par `python -m app.cli communes` (ignoré s'il est absent)",
+    )
+    archive_closed_after_days: int = Field(
+        default=365, description="Ancienneté de fermeture au-delà de laquelle un établissement est archivé"
+    )
+    import_batch_window_seconds: float = Field(
+        default=2.0, description="Délai d'attente avant de regrouper les imports en attente en requêtes SIRENE partagées"
+    )
+    import_stale_after_minutes: int = Field(
+        default=60,
+        description="Import en cours sans nouvelle page depuis ce délai : considéré interrompu et marqué en échec",
+    )
+    import_bounded_memory: bool = Field(
+        default=False,
+        description="Import en mémoire bornée : pages analysées au fil de leur réception (ijson), sans garder le corps",
+    )
+    import_profiling: bool = Field(
+        default=False, description="Profile tous les imports avec cProfile (sinon seulement les jobs avec profile=true)"
+    )
+    import_profile_dir: str = "./data/profiles"
 
     class Config:
         env_file = ".env"
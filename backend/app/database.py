@@ -1,18 +1,266 @@
+import csv
+import io
+import json
 from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Sequence
+
+from sqlalchemy import MetaData, Table, bindparam, event, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine, make_url
 from sqlmodel import Session, SQLModel, create_engine
 
-from .config import get_settings
+from .config import Settings, get_settings
+
+
+def _sqlite_pragmas(settings: Settings) -> list[str]:
+    return [
+        # WAL : les lectures de l'API ne bloquent plus les commits de l'importeur et inversement
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def build_engine(settings: Settings) -> Engine:
+    """Crée le moteur avec le profil adapté au backend (pragmas SQLite, pool PostgreSQL)."""
+    url = make_url(settings.database_url)
+    if url.get_backend_name() == "sqlite":
+        connect_args: dict[str, Any] = {"check_same_thread": False}
+        if settings.database_tuning:
+            connect_args["timeout"] = settings.sqlite_busy_timeout_ms / 1000
+        engine = create_engine(url, echo=False, connect_args=connect_args)
+        in_memory = url.database in (None, "", ":memory:")
+        if settings.database_tuning and not in_memory:
+            pragmas = _sqlite_pragmas(settings)
+
+            @event.listens_for(engine, "connect")
+            def _apply_pragmas(dbapi_connection: Any, _: Any) -> None:
+                cursor = dbapi_connection.cursor()
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+                cursor.close()
+
+        return engine
+
+    options: dict[str, Any] = {"echo": False}
+    if settings.database_tuning:
+        options.update(
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_recycle=settings.database_pool_recycle_seconds,
+            pool_pre_ping=True,
+        )
+    return create_engine(url, **options)
+
+
+@lru_cache(maxsize=None)
+def get_database_settings() -> Settings:
+    return get_settings()
+
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """Moteur créé à la première session : la configuration (CLI, variables d'environnement)
+    est appliquée avant, et importer l'application n'ouvre rien."""
+    return build_engine(get_database_settings())
+
+
+def _backfill_value(column: Any) -> Any:
+    """Valeur donnée aux lignes existantes : le défaut Python du modèle, évalué une fois."""
+    if column.default is None:
+        return None
+    if column.default.is_callable:
+        return column.default.arg(None)
+    return column.default.arg
+
+
+def _backfill_prompt_variables(connection: Connection) -> None:
+    """Variables des prompts existants, lues dans leur texte comme à l'enregistrement d'un prompt."""
+    from .models import PromptTemplate
+    from .services.templates import TemplateError, compile_template
+
+    table = PromptTemplate.__table__  # type: ignore[attr-defined]
+    updates = []
+    for prompt_id, source in connection.execute(select(table.c.id, table.c.prompt)):
+        try:
+            variables = compile_template(source).variables
+        except TemplateError:
+            continue  # template invalide : il garde la liste vide du défaut
+        updates.append({"prompt_id": prompt_id, "prompt_variables": list(variables)})
+    if updates:
+        connection.execute(
+            table.update().where(table.c.id == bindparam("prompt_id")).values(variables=bindparam("prompt_variables")),
+            updates,
+        )
+
 
+# colonnes dont la valeur se déduit des autres colonnes de la ligne plutôt que du défaut du modèle
+_COMPUTED_BACKFILLS: dict[tuple[str, str], Callable[[Connection], None]] = {
+    ("prompttemplate", "variables"): _backfill_prompt_variables,
+}
 
-settings = get_settings()
-engine = create_engine(settings.database_url, echo=False, connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {})
 
+def _add_missing_columns(engine: Engine) -> list[str]:
+    """Ajoute aux tables existantes les colonnes apparues dans les modèles depuis leur création.
 
-def init_db() -> None:
+    Les colonnes sont ajoutées sans contrainte NOT NULL (que SQLite refuse sur ``ADD COLUMN``
+    sans défaut constant) puis remplies avec le défaut du modèle, que l'application fournit
+    ensuite à chaque insertion, ou calculées à partir de la ligne (``_COMPUTED_BACKFILLS``).
+    """
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as connection:
+        existing = inspect(connection)
+        missing = []
+        for table in SQLModel.metadata.sorted_tables:
+            present = {column["name"] for column in existing.get_columns(table.name)}
+            missing.extend(
+                (table, column, _backfill_value(column)) for column in table.columns if column.name not in present
+            )
+        # rien n'est modifié tant qu'une colonne ne peut pas être ajoutée
+        unsupported = [
+            f"{table.name}.{column.name}" for table, column, value in missing if value is None and not column.nullable
+        ]
+        if unsupported:
+            raise RuntimeError(
+                "Colonnes obligatoires sans valeur par défaut, à ajouter manuellement : " + ", ".join(unsupported)
+            )
+        for table, column, value in missing:
+            definition = f"{preparer.quote(column.name)} {column.type.compile(dialect=engine.dialect)}"
+            connection.execute(text(f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {definition}"))
+            if value is not None:
+                connection.execute(table.update().values({column.name: value}))
+            if (table.name, column.name) in _COMPUTED_BACKFILLS:
+                _COMPUTED_BACKFILLS[table.name, column.name](connection)
+    return [f"{table.name}.{column.name}" for table, column, _ in missing]
+
+
+def _rebuild_sqlite_table(connection: Connection, table: Table) -> None:
+    """Recrée une table SQLite selon son modèle en gardant ses lignes (colonnes retirées abandonnées).
+
+    Procédure recommandée par SQLite pour les changements qu'``ALTER TABLE`` ne sait pas faire
+    (suppression d'une colonne NOT NULL référencée par un index, ajout d'AUTOINCREMENT).
+    """
+    preparer = connection.dialect.identifier_preparer
+    existing = inspect(connection)
+    present = {column["name"] for column in existing.get_columns(table.name)}
+    # les noms d'index sont globaux : ceux de l'ancienne table sont libérés pour la nouvelle
+    for index in existing.get_indexes(table.name):
+        connection.execute(text(f"DROP INDEX {preparer.quote(index['name'])}"))
+    rebuilt = table.to_metadata(MetaData(), name=f"{table.name}_rebuilt")
+    # index nommés d'après la table : créés sous leur nom définitif une fois la table renommée
+    rebuilt.indexes.clear()
+    rebuilt.create(connection)
+    columns = ", ".join(preparer.quote(column.name) for column in table.columns if column.name in present)
+    connection.execute(
+        text(
+            f"INSERT INTO {preparer.quote(rebuilt.name)} ({columns}) "
+            f"SELECT {columns} FROM {preparer.quote(table.name)}"
+        )
+    )
+    connection.execute(text(f"DROP TABLE {preparer.quote(table.name)}"))
+    connection.execute(text(f"ALTER TABLE {preparer.quote(rebuilt.name)} RENAME TO {preparer.quote(table.name)}"))
+    for index in table.indexes:
+        index.create(connection)
+
+
+def _migrate_establishment_sites(engine: Engine) -> list[str]:
+    """Reprend le schéma où chaque établissement appartenait à un seul site (``establishment.site_id``).
+
+    Les rattachements sont copiés dans ``siteestablishment`` puis la colonne est retirée ; sur
+    SQLite, la table est reconstruite, ce qui lui donne aussi l'AUTOINCREMENT qui empêche la
+    réutilisation des identifiants des établissements archivés.
+    """
+    from .models import Establishment, SiteEstablishment
+
+    table = Establishment.__table__  # type: ignore[attr-defined]
+    preparer = engine.dialect.identifier_preparer
+    changes = []
+    with engine.begin() as connection:
+        if "site_id" in {column["name"] for column in inspect(connection).get_columns(table.name)}:
+            copied = connection.execute(
+                text(
+                    f"INSERT INTO {preparer.quote(SiteEstablishment.__tablename__)} "
+                    "(site_id, establishment_id, created_at) "
+                    f"SELECT site_id, id, imported_at FROM {preparer.quote(table.name)} WHERE site_id IS NOT NULL"
+                )
+            ).rowcount
+            changes.append(f"Rattachements repris de {table.name}.site_id : {copied}")
+            if engine.dialect.name != "sqlite":
+                connection.execute(text(f"ALTER TABLE {preparer.quote(table.name)} DROP COLUMN site_id"))
+                changes.append(f"Colonne supprimée : {table.name}.site_id")
+        if engine.dialect.name == "sqlite":
+            definition = connection.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+            ).scalar_one()
+            if changes or "AUTOINCREMENT" not in definition.upper():
+                _rebuild_sqlite_table(connection, table)
+                changes.append(f"Table reconstruite : {table.name} (AUTOINCREMENT, sans site_id)")
+    return changes
+
+
+def init_db() -> list[str]:
+    """Crée les tables, colonnes et index manquants (``python -m app.cli migrate`` ou démarrage de l'API).
+
+    Renvoie les modifications apportées à des tables existantes.
+    """
+    from . import models  # noqa: F401 - enregistre les tables avant create_all
+
+    engine = get_engine()
     SQLModel.metadata.create_all(engine)
+    # create_all ignore les tables existantes : les colonnes et index ajoutés depuis sont créés ici
+    changes = [f"Colonne ajoutée : {column}" for column in _add_missing_columns(engine)]
+    changes.extend(_migrate_establishment_sites(engine))
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    return changes
 
 
 @contextmanager
 def get_session() -> Session:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         yield session
+
+
+def _copy_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _copy_rows(session: Session, table: Any, columns: Sequence[str], rows: list[dict[str, Any]]) -> None:
+    dbapi_connection = session.connection().connection.driver_connection
+    statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+    with dbapi_connection.cursor() as cursor:
+        if hasattr(cursor, "copy"):  # psycopg 3
+            with cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row([_copy_value(row.get(column)) for column in columns])
+            return
+        # psycopg2 : COPY au format CSV, où un champ vide non guillemeté vaut NULL
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if row.get(column) is None else _copy_value(row.get(column)) for column in columns])
+        buffer.seek(0)
+        cursor.copy_expert(f"{statement} WITH (FORMAT csv)", buffer)
+
+
+def bulk_insert(session: Session, model: type[SQLModel], rows: Iterable[dict[str, Any]]) -> None:
+    """Insère des lignes en masse : ``COPY`` sur PostgreSQL, ``executemany`` ailleurs.
+
+    Les valeurs par défaut des modèles ne sont pas appliquées : chaque ligne doit fournir
+    toutes les colonnes non nulles.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    table = model.__table__  # type: ignore[attr-defined]
+    if session.get_bind().dialect.name == "postgresql" and get_database_settings().database_tuning:
+        columns = [column.name for column in table.columns if column.name in rows[0]]
+        _copy_rows(session, table, columns, rows)
+    else:
+        session.exec(insert(table), params=rows)  # type: ignore[call-overload]
@@ -1,12 +1,27 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from .config import get_settings
 from .database import init_db
-from .routers import establishments, generation, imports, pages, prompts, sites
+from .metrics import PrometheusMiddleware
+from .routers import establishments, generation, imports, metrics, pages, prompts, sites
+from .services.communes import get_commune_referential
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # schéma vérifié au démarrage du serveur, pas à l'import : les workers et la CLI démarrent vite
+    if get_settings().database_auto_migrate:
+        init_db()
+    # chargé (ou signalé absent) au démarrage plutôt qu'au premier import
+    get_commune_referential()
+    yield
 
-init_db()
 
-app = FastAPI(title="Générateur d'annuaires métiers")
+app = FastAPI(title="Générateur d'annuaires métiers", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,6 +30,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrometheusMiddleware, routes_app=app)
 
 app.include_router(sites.router)
 app.include_router(pages.router)
@@ -22,6 +38,7 @@ app.include_router(imports.router)
 app.include_router(establishments.router)
 app.include_router(prompts.router)
 app.include_router(generation.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from prometheus_client import Counter, Histogram
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REMOTE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "generateur_http_request_duration_seconds",
+    "Durée de traitement des requêtes HTTP de l'API",
+    ["router", "method", "route", "status"],
+    buckets=HTTP_BUCKETS,
+)
+
+SIRENE_REQUEST_SECONDS = Histogram(
+    "generateur_sirene_request_duration_seconds",
+    "Latence des appels à l'API SIRENE",
+    buckets=REMOTE_BUCKETS,
+)
+SIRENE_RESPONSES_TOTAL = Counter(
+    "generateur_sirene_responses_total",
+    "Réponses de l'API SIRENE par code HTTP",
+    ["status"],
+)
+SIRENE_RETRIES_TOTAL = Counter(
+    "generateur_sirene_retries_total",
+    "Nouvelles tentatives d'appel SIRENE déclenchées par tenacity",
+)
+SIRENE_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "generateur_sirene_rate_limit_wait_seconds",
+    "Attente dans RateLimiter.acquire avant un appel SIRENE",
+    buckets=(0.0, 0.01, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0),
+)
+
+IMPORT_PAGE_UPSERT_SECONDS = Histogram(
+    "generateur_import_page_upsert_duration_seconds",
+    "Durée des upserts d'une page d'établissements",
+    buckets=DB_BUCKETS,
+)
+IMPORT_PAGE_COMMIT_SECONDS = Histogram(
+    "generateur_import_page_commit_duration_seconds",
+    "Durée des commits d'une page d'établissements",
+    buckets=DB_BUCKETS,
+)
+IMPORT_ROWS_TOTAL = Counter(
+    "generateur_import_rows_total",
+    "Établissements traités par l'importeur",
+    ["result"],
+)
+
+BAN_REQUEST_SECONDS = Histogram(
+    "generateur_ban_request_duration_seconds",
+    "Latence des appels de géocodage à la BAN",
+    buckets=REMOTE_BUCKETS,
+)
+BAN_GEOCODES_TOTAL = Counter(
+    "generateur_ban_geocodes_total",
+    "Résultats de géocodage BAN (hit, miss, error)",
+    ["result"],
+)
+
+OPENAI_REQUEST_SECONDS = Histogram(
+    "generateur_openai_request_duration_seconds",
+    "Latence des appels à OpenAI",
+    ["model"],
+    buckets=REMOTE_BUCKETS,
+)
+OPENAI_TOKENS_TOTAL = Counter(
+    "generateur_openai_tokens_total",
+    "Jetons consommés auprès d'OpenAI",
+    ["model", "kind"],
+)
+
+
+def _route_labels(app: Any, scope: Scope) -> tuple[str, str]:
+    route = scope.get("route")
+    if route is None:
+        for candidate in getattr(app, "routes", ()):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    if route is None:
+        return "none", "unmatched"
+    tags = getattr(route, "tags", None)
+    return (tags[0] if tags else "root"), route.path
+
+
+class PrometheusMiddleware:
+    """Middleware ASGI mesurant la latence des requêtes par routeur et par route."""
+
+    def __init__(self, app: ASGIApp, routes_app: Any = None) -> None:
+        self.app = app
+        self.routes_app = routes_app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            router, path = _route_labels(self.routes_app, scope)
+            HTTP_REQUEST_SECONDS.labels(router, scope["method"], path, str(status_code)).observe(
+                time.perf_counter() - start
+            )
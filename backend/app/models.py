@@ -1,12 +1,16 @@
-from __future__ import annotations
-
 from datetime import datetime
 from typing import Any, Optional
 
-from sqlalchemy import JSON, Column
+from sqlalchemy import JSON, Column, Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
 
+class SiteEstablishment(SQLModel, table=True):
+    site_id: int = Field(foreign_key="site.id", primary_key=True)
+    establishment_id: int = Field(foreign_key="establishment.id", primary_key=True, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class Site(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
@@ -17,9 +21,10 @@ class Site(SQLModel, table=True):
     )
     openai_prompt: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    data_version: int = Field(default=0)
 
     pages: list["ManualPage"] = Relationship(back_populates="site")
-    establishments: list["Establishment"] = Relationship(back_populates="site")
+    establishments: list["Establishment"] = Relationship(back_populates="sites", link_model=SiteEstablishment)
 
 
 class ManualPage(SQLModel, table=True):
@@ -35,9 +40,8 @@ class ManualPage(SQLModel, table=True):
     site: "Site" = Relationship(back_populates="pages")
 
 
-class Establishment(SQLModel, table=True):
+class EstablishmentBase(SQLModel):
     id: Optional[int] = Field(default=None, primary_key=True)
-    site_id: int = Field(foreign_key="site.id", index=True)
     siren: str = Field(index=True)
     nic: str = Field(index=True)
     siret: str = Field(index=True, sa_column_kwargs={"unique": True})
@@ -50,19 +54,51 @@ class Establishment(SQLModel, table=True):
     department: Optional[str] = Field(default=None, index=True)
     is_active: bool = Field(default=True, index=True)
     closure_label: Optional[str] = None
+    closed_at: Optional[datetime] = None
     imported_at: datetime = Field(default_factory=datetime.utcnow)
     last_seen_at: datetime = Field(default_factory=datetime.utcnow)
     geo_lat: Optional[float] = Field(default=None, index=True)
     geo_lon: Optional[float] = Field(default=None, index=True)
     geo_status: Optional[str] = Field(default=None)
-    extra_metadata: dict[str, Any] | None = Field(
-        default=None, sa_column=Column(JSON, nullable=True)
+    extra_metadata: dict[str, Any] | None = Field(default=None, sa_type=JSON, nullable=True)
+
+
+class Establishment(EstablishmentBase, table=True):
+    __table_args__ = (
+        # filtres des listes d'un annuaire : état puis code postal
+        Index("ix_establishment_active_postal_code", "is_active", "postal_code"),
+        # index partiel limité aux établissements ouverts, la quasi-totalité des lectures
+        Index(
+            "ix_establishment_open_postal_code",
+            "postal_code",
+            sqlite_where=text("is_active = 1"),
+            postgresql_where=text("is_active"),
+        ),
+        # pas de réutilisation des identifiants libérés : ils restent réservés aux archivés
+        {"sqlite_autoincrement": True},
     )
 
-    site: "Site" = Relationship(back_populates="establishments")
+    sites: list["Site"] = Relationship(back_populates="establishments", link_model=SiteEstablishment)
+
+
+class ArchivedEstablishment(EstablishmentBase, table=True):
+    """Établissement fermé depuis longtemps, sorti des tables chaudes par l'archivage."""
+
+    archived_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class ArchivedSiteEstablishment(SQLModel, table=True):
+    site_id: int = Field(foreign_key="site.id", primary_key=True)
+    establishment_id: int = Field(foreign_key="archivedestablishment.id", primary_key=True, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class ImportJob(SQLModel, table=True):
+    __table_args__ = (
+        # dernière tentative et dernier succès de chaque site, lus à chaque passage du planificateur
+        Index("ix_importjob_site_status_updated_at", "site_id", "status", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     site_id: int = Field(foreign_key="site.id")
     naf_code: Optional[str] = None
@@ -76,6 +112,27 @@ class ImportJob(SQLModel, table=True):
     total_closed: int = 0
     total_errors: int = 0
     last_error: Optional[str] = None
+    rate_limit_seconds: float = 0.0
+    http_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    commit_seconds: float = 0.0
+    geocode_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    pages_processed: int = 0
+    rows_processed: int = 0
+    pages_per_second: float = 0.0
+    rows_per_second: float = 0.0
+    profile: bool = False
+    profile_path: Optional[str] = None
+
+
+class SireneUsage(SQLModel, table=True):
+    """Requêtes SIRENE réellement envoyées, enregistrées à chaque page importée (quota du planificateur)."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    recorded_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    requests: int = 0
 
 
 class PromptTemplate(SQLModel, table=True):
@@ -84,4 +141,5 @@ class PromptTemplate(SQLModel, table=True):
     label: str
     prompt: str
     scope: str = Field(default="city", description="city|postal_code|custom")
+    variables: list[str] = Field(default_factory=list, sa_type=JSON, description="Variables déclarées par le prompt")
     created_at: datetime = Field(default_factory=datetime.utcnow)
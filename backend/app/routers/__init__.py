@@ -1,9 +1,10 @@
-from . import establishments, generation, imports, pages, prompts, sites
+from . import establishments, generation, imports, metrics, pages, prompts, sites
 
 __all__ = [
     "establishments",
     "generation",
     "imports",
+    "metrics",
     "pages",
     "prompts",
     "sites",
@@ -1,11 +1,18 @@
-from typing import List, Optional
+import os
+import tempfile
+from typing import Iterator, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlmodel import Session
 
+from ..cache import cached_json_response, site_etag
+from ..database import get_session
 from ..dependencies import get_db_session
-from ..models import Establishment, Site
+from ..models import ArchivedEstablishment, ArchivedSiteEstablishment, Establishment, Site, SiteEstablishment
 from ..schemas import EstablishmentRead
+from ..serialization import dump_rows, select_fields
+from ..services.export import EstablishmentExporter
 
 router = APIRouter(prefix="/sites/{site_id}/establishments", tags=["establishments"])
 
@@ -19,15 +26,67 @@ def _get_site(session: Session, site_id: int) -> Site:
 
 @router.get("/", response_model=List[EstablishmentRead])
 def list_establishments(
+    request: Request,
     site_id: int,
     active: Optional[bool] = Query(default=None),
     postal_code: Optional[str] = Query(default=None),
+    archived: bool = Query(default=False, description="Liste les établissements archivés au lieu des établissements courants"),
     session: Session = Depends(get_db_session),
-) -> List[Establishment]:
-    _get_site(session, site_id)
-    query = select(Establishment).where(Establishment.site_id == site_id)
-    if active is not None:
-        query = query.where(Establishment.is_active == active)
-    if postal_code:
-        query = query.where(Establishment.postal_code == postal_code)
-    return session.exec(query).all()
+) -> Response:
+    site = _get_site(session, site_id)
+    model, link_model = (
+        (ArchivedEstablishment, ArchivedSiteEstablishment) if archived else (Establishment, SiteEstablishment)
+    )
+
+    def build() -> bytes:
+        query = (
+            select_fields(EstablishmentRead, model, site_id=link_model.site_id)
+            .join(link_model, link_model.establishment_id == model.id)
+            .where(link_model.site_id == site_id)
+        )
+        if active is not None:
+            query = query.where(model.is_active == active)
+        if postal_code:
+            query = query.where(model.postal_code == postal_code)
+        return dump_rows(EstablishmentRead, session.exec(query))
+
+    resource = "establishments-archived" if archived else "establishments"
+    return cached_json_response(request, site_etag(site, resource), build)
+
+
+def _stream_csv(site_id: int) -> Iterator[str]:
+    # la session de la dépendance est fermée avant l'envoi du corps : le flux ouvre la sienne
+    with get_session() as session:
+        yield from EstablishmentExporter(session, site_id).iter_csv()
+
+
+@router.get("/export.csv")
+def export_establishments_csv(site_id: int, session: Session = Depends(get_db_session)) -> StreamingResponse:
+    site = _get_site(session, site_id)
+    return StreamingResponse(
+        _stream_csv(site_id),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{site.slug}-etablissements.csv"'},
+    )
+
+
+@router.get("/export.parquet")
+def export_establishments_parquet(
+    site_id: int,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_db_session),
+) -> FileResponse:
+    site = _get_site(session, site_id)
+    handle, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(handle)
+    try:
+        EstablishmentExporter(session, site_id).write_parquet(path)
+    except RuntimeError as exc:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    background_tasks.add_task(os.remove, path)
+    return FileResponse(
+        path,
+        media_type="application/vnd.apache.parquet",
+        filename=f"{site.slug}-etablissements.parquet",
+    )
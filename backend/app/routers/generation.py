@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session
 
 from ..dependencies import get_db_session
 from ..models import PromptTemplate, Site
 from ..schemas import ContentGenerationRequest, ContentGenerationResponse
 from ..services.generation import ContentGenerationService
+from ..services.templates import TemplateError, compile_template
 
 router = APIRouter(prefix="/sites/{site_id}/generate", tags=["generation"])
 
@@ -26,10 +27,14 @@ async def generate_content(
     template = session.get(PromptTemplate, payload.template_id)
     if not template or template.site_id != site_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Template introuvable")
+    # rendu vérifié avant l'appel OpenAI : une variable manquante ne coûte pas de requête
+    try:
+        prompt = compile_template(template.prompt).render(payload.variables)
+    except TemplateError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
     try:
         service = ContentGenerationService()
     except RuntimeError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     content = await service.generate_content(payload.template_id, payload.variables, session)
-    prompt = template.prompt.format(**payload.variables)
     return ContentGenerationResponse(prompt=prompt, content=content)
@@ -1,15 +1,18 @@
 import asyncio
-from typing import List
+from typing import AsyncIterator, List, Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
-from sqlmodel import Session, select
+import orjson
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
 
 from ..database import get_session
 from ..dependencies import get_db_session
 from ..models import ImportJob, Site
 from ..schemas import ImportJobCreate, ImportJobRead
-from ..services.geocoding import geocode_in_background
-from ..services.sirene import SireneImporter
+from ..serialization import rows_response, select_fields
+from ..services.progress import job_snapshot, progress_broker
 
 router = APIRouter(prefix="/sites/{site_id}/imports", tags=["imports"])
 
@@ -22,9 +25,12 @@ def _get_site(session: Session, site_id: int) -> Site:
 
 
 @router.get("/", response_model=List[ImportJobRead])
-def list_import_jobs(site_id: int, session: Session = Depends(get_db_session)) -> List[ImportJob]:
+def list_import_jobs(site_id: int, session: Session = Depends(get_db_session)) -> Response:
     _get_site(session, site_id)
-    return session.exec(select(ImportJob).where(ImportJob.site_id == site_id)).all()
+    return rows_response(
+        ImportJobRead,
+        session.exec(select_fields(ImportJobRead, ImportJob).where(ImportJob.site_id == site_id)),
+    )
 
 
 @router.post("/", response_model=ImportJobRead, status_code=status.HTTP_201_CREATED)
@@ -43,16 +49,43 @@ def create_import_job(
     return job
 
 
-def schedule_import_job(job_id: int) -> None:
-    loop = asyncio.get_event_loop()
-    loop.create_task(run_import_job(job_id))
-
-
-async def run_import_job(job_id: int) -> None:
-    importer = SireneImporter()
+def _load_snapshot(job_id: int) -> Optional[dict]:
     with get_session() as session:
         job = session.get(ImportJob, job_id)
-        if not job:
-            return
-        await importer.import_for_site(session, job)
-        await geocode_in_background(get_session, job.site_id)
+        return job_snapshot(job) if job else None
+
+
+async def _progress_events(job_id: int, initial: dict) -> AsyncIterator[bytes]:
+    async def reload() -> Optional[dict]:
+        return await asyncio.to_thread(_load_snapshot, job_id)
+
+    async for snapshot in progress_broker.subscribe(job_id, initial, reload=reload):
+        if snapshot is None:
+            yield b": keep-alive\n\n"
+        else:
+            yield b"event: progress\ndata: " + orjson.dumps(snapshot) + b"\n\n"
+
+
+@router.get("/{job_id}/events")
+def stream_import_job(site_id: int, job_id: int, session: Session = Depends(get_db_session)) -> StreamingResponse:
+    job = session.get(ImportJob, job_id)
+    if not job or job.site_id != site_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import introuvable")
+    return StreamingResponse(
+        _progress_events(job_id, job_snapshot(job)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+_import_runner: Optional[asyncio.Task] = None
+
+
+async def schedule_import_job(job_id: int) -> None:
+    """Réveille le traitement des imports en attente ; le job y sera planifié avec les autres."""
+    global _import_runner
+    if _import_runner is None or _import_runner.done():
+        # importeur, géocodage et leurs clients HTTP chargés au premier import, pas au démarrage
+        from ..services.scheduler import run_pending_imports
+
+        _import_runner = asyncio.create_task(run_pending_imports())
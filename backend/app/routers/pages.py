@@ -1,12 +1,14 @@
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlmodel import Session
 
+from ..cache import bump_site_version, cached_json_response, site_etag
 from ..dependencies import get_db_session
 from ..models import ManualPage, Site
 from ..schemas import ManualPageCreate, ManualPageRead, ManualPageUpdate
+from ..serialization import dump_rows, select_fields
 
 router = APIRouter(prefix="/sites/{site_id}/pages", tags=["pages"])
 
@@ -19,9 +21,16 @@ def _get_site(session: Session, site_id: int) -> Site:
 
 
 @router.get("/", response_model=List[ManualPageRead])
-def list_pages(site_id: int, session: Session = Depends(get_db_session)) -> List[ManualPage]:
-    _get_site(session, site_id)
-    return session.exec(select(ManualPage).where(ManualPage.site_id == site_id)).all()
+def list_pages(request: Request, site_id: int, session: Session = Depends(get_db_session)) -> Response:
+    site = _get_site(session, site_id)
+    return cached_json_response(
+        request,
+        site_etag(site, "pages"),
+        lambda: dump_rows(
+            ManualPageRead,
+            session.exec(select_fields(ManualPageRead, ManualPage).where(ManualPage.site_id == site_id)),
+        ),
+    )
 
 
 @router.post("/", response_model=ManualPageRead, status_code=status.HTTP_201_CREATED)
@@ -33,6 +42,7 @@ def create_page(
     _get_site(session, site_id)
     page = ManualPage(site_id=site_id, **payload.dict())
     session.add(page)
+    bump_site_version(session, site_id)
     session.commit()
     session.refresh(page)
     return page
@@ -60,6 +70,7 @@ def update_page(
         setattr(page, key, value)
     page.updated_at = datetime.utcnow()
     session.add(page)
+    bump_site_version(session, site_id)
     session.commit()
     session.refresh(page)
     return page
@@ -71,4 +82,5 @@ def delete_page(site_id: int, page_id: int, session: Session = Depends(get_db_se
     if not page or page.site_id != site_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Page introuvable")
     session.delete(page)
+    bump_site_version(session, site_id)
     session.commit()
@@ -1,11 +1,18 @@
-from typing import List
+from itertools import islice
+from typing import Iterator, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
 
+from ..cache import bump_site_version, cached_json_response, site_etag
+from ..database import get_session
 from ..dependencies import get_db_session
 from ..models import PromptTemplate, Site
 from ..schemas import PromptTemplateCreate, PromptTemplateRead
+from ..serialization import dump_rows, select_fields
+from ..services.templates import SCOPE_VARIABLES, TemplateError, compile_template, iter_scope_variables
 
 router = APIRouter(prefix="/sites/{site_id}/prompts", tags=["prompts"])
 
@@ -18,9 +25,16 @@ def _get_site(session: Session, site_id: int) -> Site:
 
 
 @router.get("/", response_model=List[PromptTemplateRead])
-def list_prompts(site_id: int, session: Session = Depends(get_db_session)) -> List[PromptTemplate]:
-    _get_site(session, site_id)
-    return session.exec(select(PromptTemplate).where(PromptTemplate.site_id == site_id)).all()
+def list_prompts(request: Request, site_id: int, session: Session = Depends(get_db_session)) -> Response:
+    site = _get_site(session, site_id)
+    return cached_json_response(
+        request,
+        site_etag(site, "prompts"),
+        lambda: dump_rows(
+            PromptTemplateRead,
+            session.exec(select_fields(PromptTemplateRead, PromptTemplate).where(PromptTemplate.site_id == site_id)),
+        ),
+    )
 
 
 @router.post("/", response_model=PromptTemplateRead, status_code=status.HTTP_201_CREATED)
@@ -30,8 +44,13 @@ def create_prompt(
     session: Session = Depends(get_db_session),
 ) -> PromptTemplate:
     _get_site(session, site_id)
-    prompt = PromptTemplate(site_id=site_id, **payload.dict())
+    try:
+        compiled = compile_template(payload.prompt)
+    except TemplateError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    prompt = PromptTemplate(site_id=site_id, variables=list(compiled.variables), **payload.dict())
     session.add(prompt)
+    bump_site_version(session, site_id)
     session.commit()
     session.refresh(prompt)
     return prompt
@@ -43,4 +62,39 @@ def delete_prompt(site_id: int, prompt_id: int, session: Session = Depends(get_d
     if not prompt or prompt.site_id != site_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt introuvable")
     session.delete(prompt)
+    bump_site_version(session, site_id)
     session.commit()
+
+
+def _stream_rendered(site_id: int, source: str, scope: str, limit: Optional[int]) -> Iterator[bytes]:
+    template = compile_template(source)
+    # la session de la dépendance est fermée avant l'envoi du corps : le flux ouvre la sienne
+    with get_session() as session:
+        for variables in islice(iter_scope_variables(session, session.get(Site, site_id), scope), limit):
+            yield orjson.dumps({"variables": variables, "prompt": template.render(variables)}) + b"\n"
+
+
+@router.get("/{prompt_id}/render")
+def render_prompt(
+    site_id: int,
+    prompt_id: int,
+    limit: Optional[int] = Query(None, ge=1, description="Nombre maximal de prompts rendus"),
+    session: Session = Depends(get_db_session),
+) -> StreamingResponse:
+    """Rend le prompt pour chaque ville ou code postal du site (NDJSON, une ligne par rendu)."""
+    _get_site(session, site_id)
+    prompt = session.get(PromptTemplate, prompt_id)
+    if not prompt or prompt.site_id != site_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt introuvable")
+    if prompt.scope not in SCOPE_VARIABLES:
+        raise HTTPException(status_code=400, detail=f"Pas de rendu en lot pour la portée {prompt.scope}")
+    # vérifié une fois pour tout le lot : les lignes agrégées ont toutes les mêmes variables
+    missing = compile_template(prompt.prompt).missing(SCOPE_VARIABLES[prompt.scope])
+    if missing:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Variables indisponibles pour la portée {prompt.scope} : {', '.join(missing)}",
+        )
+    return StreamingResponse(
+        _stream_rendered(site_id, prompt.prompt, prompt.scope, limit), media_type="application/x-ndjson"
+    )
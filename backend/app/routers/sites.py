@@ -1,18 +1,25 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlmodel import Session
 
+from ..cache import bump_site_version, cached_json_response, sites_etag
 from ..dependencies import get_db_session
 from ..models import Site
 from ..schemas import SiteCreate, SiteRead
+from ..serialization import dump_rows, select_fields
+from ..services.archive import delete_site_establishments
 
 router = APIRouter(prefix="/sites", tags=["sites"])
 
 
 @router.get("/", response_model=List[SiteRead])
-def list_sites(session: Session = Depends(get_db_session)) -> List[Site]:
-    return session.exec(select(Site)).all()
+def list_sites(request: Request, session: Session = Depends(get_db_session)) -> Response:
+    return cached_json_response(
+        request,
+        sites_etag(session),
+        lambda: dump_rows(SiteRead, session.exec(select_fields(SiteRead, Site))),
+    )
 
 
 @router.post("/", response_model=SiteRead, status_code=status.HTTP_201_CREATED)
@@ -40,6 +47,7 @@ def update_site(site_id: int, payload: SiteCreate, session: Session = Depends(ge
     for key, value in payload.dict().items():
         setattr(site, key, value)
     session.add(site)
+    bump_site_version(session, site_id)
     session.commit()
     session.refresh(site)
     return site
@@ -50,5 +58,6 @@ def delete_site(site_id: int, session: Session = Depends(get_db_session)) -> Non
     site = session.get(Site, site_id)
     if not site:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Site introuvable")
+    delete_site_establishments(session, site_id)
     session.delete(site)
     session.commit()
@@ -53,6 +53,7 @@ class EstablishmentRead(BaseModel):
     department: Optional[str]
     is_active: bool
     closure_label: Optional[str]
+    closed_at: Optional[datetime] = None
     imported_at: datetime
     last_seen_at: datetime
     geo_lat: Optional[float]
@@ -65,6 +66,7 @@ class ImportJobCreate(BaseModel):
     naf_code: Optional[str] = None
     department: Optional[str] = None
     city: Optional[str] = None
+    profile: bool = False
 
 
 class ImportJobRead(ImportJobCreate):
@@ -78,6 +80,18 @@ class ImportJobRead(ImportJobCreate):
     total_closed: int
     total_errors: int
     last_error: Optional[str]
+    rate_limit_seconds: float
+    http_seconds: float
+    parse_seconds: float
+    upsert_seconds: float
+    commit_seconds: float
+    geocode_seconds: float
+    elapsed_seconds: float
+    pages_processed: int
+    rows_processed: int
+    pages_per_second: float
+    rows_per_second: float
+    profile_path: Optional[str]
 
 
 class PromptTemplateCreate(BaseModel):
@@ -89,6 +103,7 @@ class PromptTemplateCreate(BaseModel):
 class PromptTemplateRead(PromptTemplateCreate):
     id: int
     site_id: int
+    variables: list[str] = []
     created_at: datetime
 
 
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Iterable
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from sqlmodel import SQLModel, select
+
+
+@lru_cache(maxsize=None)
+def _field_names(schema: type[BaseModel]) -> tuple[str, ...]:
+    return tuple(schema.model_fields)
+
+
+def select_fields(schema: type[BaseModel], model: type[SQLModel], **overrides: Any):
+    """Sélectionne uniquement les colonnes exposées par ``schema``, dans son ordre de champs.
+
+    ``overrides`` remplace la colonne de ``model`` pour certains champs (colonne d'une jointure).
+    """
+    return select(*(overrides.get(name, getattr(model, name, None)) for name in _field_names(schema)))
+
+
+def dump_rows(schema: type[BaseModel], rows: Iterable[Any]) -> bytes:
+    """Sérialise des lignes issues de :func:`select_fields` sans repasser par la validation pydantic."""
+    names = _field_names(schema)
+    return orjson.dumps([dict(zip(names, row)) for row in rows])
+
+
+def rows_response(schema: type[BaseModel], rows: Iterable[Any]) -> Response:
+    return Response(content=dump_rows(schema, rows), media_type="application/json")
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Collection
+
+from sqlalchemy import insert, literal
+from sqlmodel import Session, delete, select
+
+from ..cache import bump_establishment_sites
+from ..models import ArchivedEstablishment, ArchivedSiteEstablishment, Establishment, SiteEstablishment
+
+ARCHIVE_BATCH_SIZE = 1000
+
+_COLUMNS = [column.name for column in Establishment.__table__.columns]  # type: ignore[attr-defined]
+_LINK_COLUMNS = ["site_id", "establishment_id", "created_at"]
+
+
+def _move(session: Session, ids: Collection[int], source, source_links, target, target_links, **extra) -> None:
+    source_table = source.__table__
+    source_links_table = source_links.__table__
+    session.exec(
+        insert(target.__table__).from_select(  # type: ignore[call-overload]
+            _COLUMNS + list(extra),
+            select(*(source_table.c[name] for name in _COLUMNS), *(literal(value) for value in extra.values())).where(
+                source_table.c.id.in_(ids)
+            ),
+        )
+    )
+    session.exec(
+        insert(target_links.__table__).from_select(  # type: ignore[call-overload]
+            _LINK_COLUMNS,
+            select(*(source_links_table.c[name] for name in _LINK_COLUMNS)).where(
+                source_links_table.c.establishment_id.in_(ids)
+            ),
+        )
+    )
+    session.exec(delete(source_links).where(source_links.establishment_id.in_(ids)))
+    session.exec(delete(source).where(source.id.in_(ids)))
+
+
+def archive_closed_establishments(
+    session: Session, closed_for: timedelta, batch_size: int = ARCHIVE_BATCH_SIZE
+) -> int:
+    """Déplace vers les tables froides les établissements fermés depuis plus de ``closed_for``.
+
+    Les lots sont validés un par un ; les sites concernés voient leur version incrémentée.
+    """
+    cutoff = datetime.utcnow() - closed_for
+    archived = 0
+    while True:
+        ids = session.exec(
+            select(Establishment.id)
+            .where(Establishment.is_active == False)  # noqa: E712
+            .where(Establishment.closed_at < cutoff)
+            .order_by(Establishment.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return archived
+        bump_establishment_sites(session, ids)
+        _move(
+            session,
+            ids,
+            Establishment,
+            SiteEstablishment,
+            ArchivedEstablishment,
+            ArchivedSiteEstablishment,
+            archived_at=datetime.utcnow(),
+        )
+        session.commit()
+        archived += len(ids)
+
+
+def restore_establishments(session: Session, ids: Collection[int]) -> None:
+    """Remet dans les tables chaudes des établissements archivés, par exemple rouverts ; sans commit."""
+    if not ids:
+        return
+    _move(session, ids, ArchivedEstablishment, ArchivedSiteEstablishment, Establishment, SiteEstablishment)
+    bump_establishment_sites(session, ids)
+
+
+def delete_site_establishments(session: Session, site_id: int, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Détache un site de ses établissements, chauds et archivés, et supprime ceux qui ne sont
+    plus rattachés à aucun autre site ; sans commit (la suppression du site reste atomique).
+
+    Renvoie le nombre d'établissements supprimés.
+    """
+    deleted = 0
+    tables = ((Establishment, SiteEstablishment), (ArchivedEstablishment, ArchivedSiteEstablishment))
+    for establishments, links in tables:
+        while True:
+            ids = session.exec(select(links.establishment_id).where(links.site_id == site_id).limit(batch_size)).all()
+            if not ids:
+                break
+            session.exec(delete(links).where(links.site_id == site_id, links.establishment_id.in_(ids)))
+            shared = select(links.establishment_id).where(links.establishment_id.in_(ids))
+            result = session.exec(
+                delete(establishments).where(establishments.id.in_(ids), establishments.id.not_in(shared))
+            )
+            deleted += result.rowcount
+    return deleted
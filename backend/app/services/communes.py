@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# communes et arrondissements municipaux (codes utilisés par SIRENE pour Paris, Lyon et Marseille)
+COMMUNES_SOURCE_URL = (
+    "https://geo.api.gouv.fr/communes?type=commune-actuelle,arrondissement-municipal"
+    "&fields=nom,code,codesPostaux,codeDepartement,centre&format=json"
+)
+
+# en-tête, puis deux tables d'adressage direct de 100 000 entrées (code commune, code postal)
+# contenant la position des enregistrements dans la suite du fichier (0 : absent)
+_MAGIC = b"GACOMM01"
+_HEADER = struct.Struct("<8sI")
+_SLOT = struct.Struct("<I")
+_SLOTS = 100_000
+_COMMUNE_SLOTS = _HEADER.size
+_POSTAL_SLOTS = _COMMUNE_SLOTS + _SLOTS * _SLOT.size
+_DATA = _POSTAL_SLOTS + _SLOTS * _SLOT.size
+# code, département, latitude, longitude, longueur du nom, nombre de codes postaux
+_COMMUNE = struct.Struct("<5s3sffBB")
+_POSTAL_COUNT = struct.Struct("<H")
+
+
+def _slot(code: Optional[str]) -> Optional[int]:
+    if not code or len(code) != 5:
+        return None
+    code = code.upper()
+    if code[:2] in ("2A", "2B"):
+        # les numéros des communes corses sont uniques sur l'ancien département 20
+        code = "20" + code[2:]
+    return int(code) if code.isdigit() else None
+
+
+def normalize_name(name: str) -> str:
+    """Forme de comparaison d'un nom de commune : sans accents ni ponctuation, en majuscules."""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.split(r"[^A-Z0-9]+", ascii_name.upper())).strip()
+
+
+class Commune:
+    __slots__ = ("code", "name", "department", "postal_codes", "lat", "lon")
+
+    def __init__(
+        self, code: str, name: str, department: str, postal_codes: list[str], lat: float, lon: float
+    ) -> None:
+        self.code = code
+        self.name = name
+        self.department = department
+        self.postal_codes = postal_codes
+        self.lat = lat
+        self.lon = lon
+
+    def __repr__(self) -> str:
+        return f"Commune({self.code!r}, {self.name!r})"
+
+
+class CommuneReferential:
+    """Référentiel des communes projeté en mémoire : recherche en temps constant par code
+    commune INSEE ou par code postal, sans appel réseau."""
+
+    def __init__(self, path: str | Path) -> None:
+        with open(path, "rb") as handle:
+            self._data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self._data, 0)
+        if magic != _MAGIC:
+            self._data.close()
+            raise ValueError(f"{path} n'est pas un référentiel des communes")
+
+    def close(self) -> None:
+        self._data.close()
+
+    def _read(self, offset: int) -> Commune:
+        code, department, lat, lon, name_length, postal_count = _COMMUNE.unpack_from(self._data, offset)
+        offset += _COMMUNE.size
+        name = self._data[offset : offset + name_length].decode("utf-8")
+        offset += name_length
+        postal_codes = [
+            self._data[start : start + 5].decode("ascii") for start in range(offset, offset + 5 * postal_count, 5)
+        ]
+        # centres stockés en simple précision (~1 m) : arrondis pour ne pas exposer le bruit du float32
+        return Commune(
+            code.decode("ascii"),
+            name,
+            department.rstrip(b"\0").decode("ascii"),
+            postal_codes,
+            round(lat, 5),
+            round(lon, 5),
+        )
+
+    def get(self, code: Optional[str]) -> Optional[Commune]:
+        slot = _slot(code)
+        if slot is None:
+            return None
+        (offset,) = _SLOT.unpack_from(self._data, _COMMUNE_SLOTS + slot * _SLOT.size)
+        if not offset:
+            return None
+        commune = self._read(offset)
+        return commune if commune.code == code.upper() else None  # type: ignore[union-attr]
+
+    def by_postal_code(self, postal_code: Optional[str]) -> list[Commune]:
+        slot = _slot(postal_code)
+        if slot is None:
+            return []
+        (offset,) = _SLOT.unpack_from(self._data, _POSTAL_SLOTS + slot * _SLOT.size)
+        if not offset:
+            return []
+        (count,) = _POSTAL_COUNT.unpack_from(self._data, offset)
+        start = offset + _POSTAL_COUNT.size
+        return [
+            self._read(_SLOT.unpack_from(self._data, position)[0])
+            for position in range(start, start + count * _SLOT.size, _SLOT.size)
+        ]
+
+    def resolve(
+        self, commune_code: Optional[str] = None, postal_code: Optional[str] = None, city: Optional[str] = None
+    ) -> Optional[Commune]:
+        """Commune d'un établissement : par code INSEE, sinon par code postal (et nom si ambigu)."""
+        if commune := self.get(commune_code):
+            return commune
+        candidates = self.by_postal_code(postal_code)
+        if len(candidates) == 1:
+            return candidates[0]
+        if city:
+            wanted = normalize_name(city)
+            for candidate in candidates:
+                if normalize_name(candidate.name) == wanted:
+                    return candidate
+        return None
+
+
+def build_commune_referential(communes: Iterable[dict[str, Any]], path: str | Path) -> int:
+    """Écrit le référentiel à partir d'enregistrements au format de geo.api.gouv.fr.
+
+    Le fichier est remplacé atomiquement : les processus qui l'ont déjà projeté gardent l'ancien.
+    """
+    commune_slots = [0] * _SLOTS
+    postal_members: dict[int, list[int]] = {}
+    data = bytearray()
+    count = 0
+    for commune in communes:
+        code = str(commune.get("code") or "").upper()
+        slot = _slot(code)
+        if slot is None:
+            continue
+        coordinates = (commune.get("centre") or {}).get("coordinates") or [float("nan"), float("nan")]
+        department = commune.get("codeDepartement") or (code[:3] if code.startswith("97") else code[:2])
+        name = str(commune.get("nom") or "").encode("utf-8")[:255]
+        postal_codes = [postal for postal in commune.get("codesPostaux") or [] if _slot(postal) is not None][:255]
+        offset = _DATA + len(data)
+        commune_slots[slot] = offset
+        data += _COMMUNE.pack(
+            code.encode("ascii"), department.encode("ascii"), coordinates[1], coordinates[0], len(name), len(postal_codes)
+        )
+        data += name
+        for postal in postal_codes:
+            data += postal.encode("ascii")
+            postal_members.setdefault(_slot(postal), []).append(offset)  # type: ignore[arg-type]
+        count += 1
+
+    postal_slots = [0] * _SLOTS
+    for slot, members in postal_members.items():
+        postal_slots[slot] = _DATA + len(data)
+        data += _POSTAL_COUNT.pack(len(members))
+        data += struct.pack(f"<{len(members)}I", *members)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(path.suffix + ".tmp")
+    with open(temporary, "wb") as handle:
+        handle.write(_HEADER.pack(_MAGIC, count))
+        handle.write(struct.pack(f"<{_SLOTS}I", *commune_slots))
+        handle.write(struct.pack(f"<{_SLOTS}I", *postal_slots))
+        handle.write(data)
+    os.replace(temporary, path)
+    return count
+
+
+def load_communes_source(source: str) -> list[dict[str, Any]]:
+    """Charge la liste des communes depuis une URL (geo.api.gouv.fr) ou un fichier JSON local."""
+    if source.startswith(("http://", "https://")):
+        import httpx
+
+        response = httpx.get(source, timeout=120.0)
+        response.raise_for_status()
+        return response.json()
+    with open(source, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+@lru_cache(maxsize=None)
+def get_commune_referential() -> Optional[CommuneReferential]:
+    """Référentiel configuré (``GENERATEUR_COMMUNE_REFERENTIAL_PATH``), ou ``None`` s'il n'a pas été construit.
+
+    L'absence est signalée une seule fois par processus (le résultat est mis en cache).
+    """
+    path = Path(get_settings().commune_referential_path)
+    if not path.exists():
+        logger.warning(
+            "Référentiel des communes absent (%s) : villes, départements et centres de repli du géocodage "
+            "proviennent de SIRENE seul. Construisez-le avec `python -m app.cli communes`.",
+            path,
+        )
+        return None
+    return CommuneReferential(path)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from pathlib import Path
+from typing import Any, Iterator
+
+from sqlmodel import Session, select
+
+from ..models import Establishment, SiteEstablishment
+
+EXPORT_BATCH_SIZE = 5000
+METADATA_PREFIX = "metadata_"
+
+EXPORT_COLUMNS = [
+    "id",
+    "site_id",
+    "siren",
+    "nic",
+    "siret",
+    "business_name",
+    "naf_code",
+    "naf_label",
+    "address",
+    "postal_code",
+    "city",
+    "department",
+    "is_active",
+    "closure_label",
+    "closed_at",
+    "imported_at",
+    "last_seen_at",
+    "geo_lat",
+    "geo_lon",
+    "geo_status",
+]
+
+
+def _flatten(value: dict[str, Any], prefix: str = METADATA_PREFIX) -> dict[str, Any]:
+    flat: dict[str, Any] = {}
+    for key, item in value.items():
+        name = f"{prefix}{key}"
+        if isinstance(item, dict):
+            flat.update(_flatten(item, f"{name}_"))
+        elif isinstance(item, list):
+            flat[name] = json.dumps(item, ensure_ascii=False)
+        else:
+            flat[name] = item
+    return flat
+
+
+class EstablishmentExporter:
+    """Exporte les établissements d'un site par lots, à mémoire constante."""
+
+    def __init__(self, session: Session, site_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> None:
+        self.session = session
+        self.site_id = site_id
+        self.batch_size = batch_size
+        self._metadata_columns: list[str] | None = None
+
+    @property
+    def metadata_columns(self) -> list[str]:
+        # premier passage sur la seule colonne JSON pour figer l'en-tête avant d'écrire
+        if self._metadata_columns is None:
+            statement = (
+                select(Establishment.extra_metadata)
+                .join(SiteEstablishment, SiteEstablishment.establishment_id == Establishment.id)
+                .where(SiteEstablishment.site_id == self.site_id)
+                .execution_options(stream_results=True, yield_per=self.batch_size)
+            )
+            keys: dict[str, None] = {}
+            for metadata in self.session.exec(statement):
+                if metadata:
+                    keys.update(dict.fromkeys(_flatten(metadata)))
+            self._metadata_columns = sorted(keys)
+        return self._metadata_columns
+
+    @property
+    def columns(self) -> list[str]:
+        return EXPORT_COLUMNS + self.metadata_columns
+
+    def iter_batches(self) -> Iterator[list[dict[str, Any]]]:
+        statement = (
+            select(
+                *(getattr(SiteEstablishment if name == "site_id" else Establishment, name) for name in EXPORT_COLUMNS),
+                Establishment.extra_metadata,
+            )
+            .join(SiteEstablishment, SiteEstablishment.establishment_id == Establishment.id)
+            .where(SiteEstablishment.site_id == self.site_id)
+            .order_by(Establishment.id)
+            .execution_options(stream_results=True, yield_per=self.batch_size)
+        )
+        for partition in self.session.exec(statement).partitions(self.batch_size):
+            batch = []
+            for row in partition:
+                record = dict(zip(EXPORT_COLUMNS, row))
+                if row[-1]:
+                    record.update(_flatten(row[-1]))
+                batch.append(record)
+            yield batch
+
+    def iter_csv(self) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=self.columns, extrasaction="ignore")
+        writer.writeheader()
+        for batch in self.iter_batches():
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def write_csv(self, path: Path | str) -> int:
+        count = 0
+        with Path(path).open("w", encoding="utf-8", newline="") as handle:
+            writer = csv.DictWriter(handle, fieldnames=self.columns, extrasaction="ignore")
+            writer.writeheader()
+            for batch in self.iter_batches():
+                writer.writerows(batch)
+                count += len(batch)
+        return count
+
+    def write_parquet(self, path: Path | str) -> int:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError(
+                "L'export Parquet nécessite pyarrow (pip install 'generateur-insee-backend[export]')"
+            ) from exc
+
+        schema = pa.schema(
+            [
+                ("id", pa.int64()),
+                ("site_id", pa.int64()),
+                *((name, pa.string()) for name in EXPORT_COLUMNS[2:12]),
+                ("is_active", pa.bool_()),
+                ("closure_label", pa.string()),
+                ("closed_at", pa.timestamp("us")),
+                ("imported_at", pa.timestamp("us")),
+                ("last_seen_at", pa.timestamp("us")),
+                ("geo_lat", pa.float64()),
+                ("geo_lon", pa.float64()),
+                ("geo_status", pa.string()),
+                *((name, pa.string()) for name in self.metadata_columns),
+            ]
+        )
+        string_columns = [field.name for field in schema if pa.types.is_string(field.type)]
+        count = 0
+        with pq.ParquetWriter(str(path), schema, compression="zstd") as writer:
+            for batch in self.iter_batches():
+                for record in batch:
+                    for name in string_columns:
+                        value = record.get(name)
+                        if value is not None and not isinstance(value, str):
+                            record[name] = str(value)
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+        return count
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import time
 from typing import Any
 
-from openai import AsyncOpenAI
 from sqlmodel import Session
 
 from ..config import Settings, get_settings
+from ..metrics import OPENAI_REQUEST_SECONDS, OPENAI_TOKENS_TOTAL
 from ..models import PromptTemplate
+from .templates import compile_template
 
 
 class ContentGenerationService:
@@ -14,15 +16,24 @@ class ContentGenerationService:
         self.settings = settings or get_settings()
         if not self.settings.openai_api_key:
             raise RuntimeError("Clé OpenAI manquante")
+        # SDK chargé à la première génération : son import coûte plusieurs centaines de millisecondes
+        from openai import AsyncOpenAI
+
         self.client = AsyncOpenAI(api_key=self.settings.openai_api_key)
 
     async def generate_content(self, template_id: int, variables: dict[str, Any], session: Session) -> str:
         template = session.get(PromptTemplate, template_id)
         if not template:
             raise ValueError("Template introuvable")
-        prompt = template.prompt.format(**variables)
+        prompt = compile_template(template.prompt).render(variables)
+        model = "gpt-4.1-mini"
+        start = time.perf_counter()
         response = await self.client.responses.create(
-            model="gpt-4.1-mini",
+            model=model,
             input=prompt,
         )
+        OPENAI_REQUEST_SECONDS.labels(model).observe(time.perf_counter() - start)
+        if usage := getattr(response, "usage", None):
+            OPENAI_TOKENS_TOTAL.labels(model, "input").inc(usage.input_tokens or 0)
+            OPENAI_TOKENS_TOTAL.labels(model, "output").inc(usage.output_tokens or 0)
         return response.output_text  # type: ignore[return-value]
@@ -1,19 +1,26 @@
 from __future__ import annotations
 
 import asyncio
+import math
+import time
 from typing import Any, Optional
 
 import httpx
 from sqlmodel import Session, select
 
+from ..cache import bump_establishment_sites
 from ..config import Settings, get_settings
-from ..models import Establishment
+from ..metrics import BAN_GEOCODES_TOTAL, BAN_REQUEST_SECONDS
+from ..models import Establishment, ImportJob, SiteEstablishment
+from .communes import get_commune_referential
+from .progress import progress_broker
 
 
 class GeocodingService:
     def __init__(self, settings: Settings | None = None) -> None:
         self.settings = settings or get_settings()
         self._client = httpx.AsyncClient(base_url=self.settings.ban_base_url)
+        self.communes = get_commune_referential()
 
     async def close(self) -> None:
         await self._client.aclose()
@@ -22,44 +29,74 @@ class GeocodingService:
         params = {"q": address, "limit": 1}
         if city:
             params["city"] = city
-        response = await self._client.get("/search/", params=params)
-        response.raise_for_status()
+        try:
+            with BAN_REQUEST_SECONDS.time():
+                response = await self._client.get("/search/", params=params)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            BAN_GEOCODES_TOTAL.labels("error").inc()
+            raise
         data = response.json()
         features = data.get("features", [])
         if not features:
+            BAN_GEOCODES_TOTAL.labels("miss").inc()
             return None
+        BAN_GEOCODES_TOTAL.labels("hit").inc()
         return features[0]
 
+    def _centroid(self, establishment: Establishment) -> Optional[tuple[float, float]]:
+        if not self.communes:
+            return None
+        commune = self.communes.resolve(postal_code=establishment.postal_code, city=establishment.city)
+        if not commune or math.isnan(commune.lat):
+            return None
+        return commune.lat, commune.lon
+
     async def geocode_establishment(self, session: Session, establishment: Establishment) -> None:
-        if not establishment.address:
-            return
-        feature = await self.geocode(establishment.address, establishment.city)
+        feature = None
+        if establishment.address:
+            feature = await self.geocode(establishment.address, establishment.city)
         if not feature:
-            establishment.geo_status = "not_found"
+            # adresse absente ou inconnue de la BAN : centre de la commune, sans appel réseau
+            centroid = self._centroid(establishment)
+            if centroid:
+                establishment.geo_lat, establishment.geo_lon = centroid
+                establishment.geo_status = "centroid"
+            else:
+                establishment.geo_status = "not_found"
         else:
             geometry = feature.get("geometry", {})
             coordinates = geometry.get("coordinates", [None, None])
             establishment.geo_lon = coordinates[0]
             establishment.geo_lat = coordinates[1]
-            establishment.geo_status = feature.get("properties", {}).get("score")
+            score = feature.get("properties", {}).get("score")
+            establishment.geo_status = str(score) if score is not None else None
         session.add(establishment)
-        session.commit()
 
     async def geocode_site(self, session: Session, site_id: int, limit: int = 100) -> int:
         statement = (
             select(Establishment)
-            .where(Establishment.site_id == site_id)
+            .join(SiteEstablishment, SiteEstablishment.establishment_id == Establishment.id)
+            .where(SiteEstablishment.site_id == site_id)
             .where(Establishment.geo_lat.is_(None))
-            .where(Establishment.address.is_not(None))
+            # les échecs (not_found) ne sont pas repris, sinon le géocodage en tâche de fond ne s'arrête jamais
+            .where(Establishment.geo_status.is_(None))
             .limit(limit)
         )
         to_geocode = session.exec(statement).all()
-        count = 0
-        for establishment in to_geocode:
-            await self.geocode_establishment(session, establishment)
-            count += 1
-            await asyncio.sleep(0)  # yield control for cooperative multitasking
-        return count
+        geocoded: list[int] = []
+        try:
+            for establishment in to_geocode:
+                await self.geocode_establishment(session, establishment)
+                geocoded.append(establishment.id)
+                await asyncio.sleep(0)  # yield control for cooperative multitasking
+        finally:
+            # un commit et une invalidation par lot : les ETag et caches des sites ne changent
+            # pas à chaque adresse ; une erreur de la BAN garde les adresses déjà géocodées
+            if geocoded:
+                bump_establishment_sites(session, geocoded)
+                session.commit()
+        return len(geocoded)
 
 
 async def geocode_in_background(
@@ -67,14 +104,37 @@ async def geocode_in_background(
     site_id: int,
     chunk_size: int = 50,
     delay_seconds: int = 1,
+    job_id: int | None = None,
 ) -> None:
     service = GeocodingService()
+    started = time.monotonic()
+    geocoded = 0
+    busy_seconds = 0.0
+    if job_id is not None:
+        progress_broker.publish(job_id, geocoding="running", geocoded=0, geocodes_per_second=0.0)
     try:
         while True:
+            chunk_started = time.perf_counter()
             with session_factory() as session:
                 processed = await service.geocode_site(session, site_id, limit=chunk_size)
+            busy_seconds += time.perf_counter() - chunk_started
+            geocoded += processed
+            if job_id is not None:
+                progress_broker.publish(
+                    job_id,
+                    geocoded=geocoded,
+                    geocodes_per_second=geocoded / max(time.monotonic() - started, 1e-6),
+                )
             if processed == 0:
                 break
             await asyncio.sleep(delay_seconds)
     finally:
         await service.close()
+        if job_id is not None:
+            with session_factory() as session:
+                job = session.get(ImportJob, job_id)
+                if job:
+                    job.geocode_seconds = (job.geocode_seconds or 0.0) + busy_seconds
+                    session.add(job)
+                    session.commit()
+            progress_broker.publish(job_id, geocoding="completed")
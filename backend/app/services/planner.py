@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Callable, Iterable, Optional
+
+from sqlmodel import Session, select, update
+
+from ..models import ImportJob, Site
+from .communes import get_commune_referential
+
+BASE_FILTERS = {
+    "statutDiffusion": "O",
+    "etatAdministratifEtablissement": "A,B,F",
+}
+SITE_FILTER_KEYS = (
+    "codeNaf",
+    "codePostalEtablissement",
+    "codeCommuneEtablissement",
+    "codeDepartementEtablissement",
+)
+
+Filters = dict[str, frozenset[str]]
+
+
+def build_filters(site: Site, job: ImportJob) -> dict[str, str]:
+    filters = dict(BASE_FILTERS)
+    sirene_filters = site.sirene_filters or {}
+    for key in SITE_FILTER_KEYS:
+        if value := sirene_filters.get(key):
+            filters[key] = value
+    if job.naf_code:
+        filters["codeNaf"] = job.naf_code
+    if job.department:
+        filters["codeDepartementEtablissement"] = job.department
+    if job.city:
+        filters["codeCommuneEtablissement"] = job.city
+    return filters
+
+
+def _normalize(key: str, value: str) -> str:
+    value = value.strip().upper()
+    if key == "codeNaf" and len(value) == 5 and "." not in value:
+        # forme ponctuée renvoyée par SIRENE (43.22A), les sites peuvent saisir 4322A
+        return f"{value[:2]}.{value[2:]}"
+    return value
+
+
+def parse_filters(filters: dict[str, str]) -> Filters:
+    """Convertit des paramètres SIRENE (valeurs séparées par des virgules) en ensembles de valeurs."""
+    return {
+        key: frozenset(_normalize(key, part) for part in str(value).split(",") if part.strip())
+        for key, value in filters.items()
+    }
+
+
+def _matching_filters(filters: Filters) -> Filters:
+    return {key: values for key, values in filters.items() if key in _EXTRACTORS}
+
+
+def _current_period(payload: dict[str, Any]) -> dict[str, Any]:
+    periods = payload.get("periodesEtablissement") or []
+    return periods[-1] if periods else {}
+
+
+def _department(payload: dict[str, Any]) -> Optional[str]:
+    current = _current_period(payload)
+    if department := current.get("codeDepartementEtablissement"):
+        return department
+    referential = get_commune_referential()
+    if referential and (commune := referential.get(current.get("codeCommuneEtablissement"))):
+        return commune.department
+    commune = current.get("codeCommuneEtablissement") or current.get("codePostalEtablissement")
+    if not commune:
+        return None
+    return commune[:3] if commune.startswith("97") else commune[:2]
+
+
+# valeur d'un établissement renvoyé par SIRENE pour chaque critère propre à un site
+_EXTRACTORS: dict[str, Callable[[dict[str, Any]], Optional[str]]] = {
+    "codeNaf": lambda payload: payload.get("activitePrincipaleEtablissement"),
+    "codePostalEtablissement": lambda payload: _current_period(payload).get("codePostalEtablissement"),
+    "codeCommuneEtablissement": lambda payload: _current_period(payload).get("codeCommuneEtablissement"),
+    "codeDepartementEtablissement": _department,
+}
+
+
+def _matches(matching_filters: Filters, payload: dict[str, Any]) -> bool:
+    """Vérifie les critères propres à un site ; les filtres communs (diffusion, état
+    administratif) sont partagés par toutes les requêtes planifiées."""
+    for key, values in matching_filters.items():
+        value = _EXTRACTORS[key](payload)
+        if value is None or _normalize(key, value) not in values:
+            return False
+    return True
+
+
+def covers(general: Filters, specific: Filters) -> bool:
+    """Vrai si tout établissement satisfaisant ``specific`` satisfait aussi ``general``."""
+    return all(key in specific and specific[key] <= values for key, values in general.items())
+
+
+def _merge_key(first: Filters, second: Filters) -> Optional[str]:
+    """Critère unique sur lequel deux filtres diffèrent ; leur union reste alors exacte."""
+    if first.keys() != second.keys():
+        return None
+    different = [key for key in first if first[key] != second[key]]
+    return different[0] if len(different) == 1 else None
+
+
+class PlannedImport:
+    """Requête SIRENE partagée par un ou plusieurs jobs d'import."""
+
+    def __init__(self, filters: Filters, targets: list[tuple[ImportJob, Site, Filters]]) -> None:
+        # chaque cible porte les critères normalisés de son job, utilisés pour le routage
+        self.filters = filters
+        self.targets = targets
+
+    @property
+    def jobs(self) -> list[ImportJob]:
+        return [job for job, _, _ in self.targets]
+
+    @property
+    def params(self) -> dict[str, str]:
+        return {key: ",".join(sorted(values)) for key, values in self.filters.items()}
+
+    def route(self, payload: dict[str, Any]) -> list[tuple[ImportJob, Site]]:
+        """Jobs (et leurs sites) auxquels rattacher un établissement renvoyé par la requête."""
+        if len(self.targets) == 1:
+            job, site, _ = self.targets[0]
+            return [(job, site)]
+        return [(job, site) for job, site, filters in self.targets if _matches(filters, payload)]
+
+    def absorb(self, other: PlannedImport) -> None:
+        self.targets.extend(other.targets)
+
+
+def plan_imports(targets: Iterable[tuple[ImportJob, Site]]) -> list[PlannedImport]:
+    """Regroupe des jobs en un nombre minimal de requêtes SIRENE couvrant tous leurs filtres.
+
+    Un filtre inclus dans un autre est absorbé par celui-ci ; deux filtres qui ne diffèrent
+    que par les valeurs d'un seul critère sont fusionnés en une requête sur leur union.
+    """
+    plans = []
+    for job, site in targets:
+        filters = parse_filters(build_filters(site, job))
+        plans.append(PlannedImport(dict(filters), [(job, site, _matching_filters(filters))]))
+
+    merged = True
+    while merged:
+        merged = False
+        for first in plans:
+            for second in plans:
+                if first is second:
+                    continue
+                if covers(first.filters, second.filters):
+                    first.absorb(second)
+                elif key := _merge_key(first.filters, second.filters):
+                    first.filters[key] = first.filters[key] | second.filters[key]
+                    first.absorb(second)
+                else:
+                    continue
+                plans.remove(second)
+                merged = True
+                break
+            if merged:
+                break
+    return plans
+
+
+def pending_imports(session: Session) -> list[tuple[ImportJob, Site]]:
+    """Jobs en attente avec leur site, du plus ancien au plus récent."""
+    statement = (
+        select(ImportJob, Site)
+        .join(Site, Site.id == ImportJob.site_id)
+        .where(ImportJob.status == "pending")
+        .order_by(ImportJob.id)
+    )
+    return list(session.exec(statement).all())
+
+
+def claim_imports(session: Session, targets: Iterable[tuple[ImportJob, Site]]) -> list[tuple[ImportJob, Site]]:
+    """Passe les jobs encore en attente à ``running`` et ne garde que ceux effectivement réclamés.
+
+    Chaque mise à jour est conditionnée au statut ``pending`` : un job déjà pris par un autre
+    worker (ou par le planificateur) n'est jamais exécuté deux fois.
+    """
+    claimed = []
+    now = datetime.utcnow()
+    for job, site in targets:
+        result = session.exec(
+            update(ImportJob)
+            .where(ImportJob.id == job.id, ImportJob.status == "pending")
+            .values(status="running", updated_at=now)
+            .execution_options(synchronize_session=False)
+        )  # type: ignore[call-overload]
+        if result.rowcount == 1:
+            claimed.append((job, site))
+    session.commit()
+    for job, _ in claimed:
+        session.refresh(job)
+    return claimed
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import cProfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from ..models import ImportJob
+
+PHASES = ("rate_limit", "http", "parse", "upsert", "commit", "geocode")
+
+
+class PhaseTimings:
+    """Temps cumulés par phase d'un import, ajoutés aux valeurs déjà enregistrées sur le job."""
+
+    def __init__(self, job: Optional[ImportJob] = None) -> None:
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self._base = {phase: (getattr(job, f"{phase}_seconds") or 0.0) if job else 0.0 for phase in PHASES}
+        self._base_elapsed = (job.elapsed_seconds or 0.0) if job else 0.0
+        self._base_pages = (job.pages_processed or 0) if job else 0
+        self._base_rows = (job.rows_processed or 0) if job else 0
+        self._started = time.perf_counter()
+        self.pages = 0
+        self.rows = 0
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[phase] += time.perf_counter() - start
+
+    def store(self, job: ImportJob) -> None:
+        for phase in PHASES:
+            setattr(job, f"{phase}_seconds", self._base[phase] + self.seconds[phase])
+        job.elapsed_seconds = self._base_elapsed + time.perf_counter() - self._started
+        job.pages_processed = self._base_pages + self.pages
+        job.rows_processed = self._base_rows + self.rows
+        if job.elapsed_seconds:
+            job.pages_per_second = job.pages_processed / job.elapsed_seconds
+            job.rows_per_second = job.rows_processed / job.elapsed_seconds
+
+
+@contextmanager
+def profile_job(job: ImportJob, output_dir: Path | str, enabled: bool) -> Iterator[Optional[Path]]:
+    """Profile le bloc avec cProfile et écrit un fichier ``.prof`` lisible par pstats ou snakeviz.
+
+    Le profileur est global au thread : les autres tâches asyncio exécutées pendant l'import
+    apparaissent aussi dans le rapport.
+    """
+    if not enabled:
+        yield None
+        return
+    directory = Path(output_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"import-job-{job.id}-{datetime.utcnow():%Y%m%dT%H%M%S}.prof"
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield path
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from ..models import ImportJob
+
+KEEPALIVE_SECONDS = 15.0
+# relecture de la base pour les imports exécutés par un autre processus (planificateur, worker)
+POLL_SECONDS = 3.0
+
+
+def job_snapshot(job: ImportJob) -> dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "site_id": job.site_id,
+        "status": job.status,
+        "cursor": job.cursor,
+        "total_imported": job.total_imported,
+        "total_closed": job.total_closed,
+        "total_errors": job.total_errors,
+        "last_error": job.last_error,
+        "done": job.status in ("completed", "failed"),
+    }
+
+
+class ImportProgressBroker:
+    """Diffuse en mémoire la progression des imports à tous les abonnés, sans relire la base.
+
+    Chaque abonné dispose d'une file d'une seule place : seul le dernier état compte, un
+    client lent saute les états intermédiaires au lieu de ralentir l'importeur.
+    """
+
+    def __init__(self) -> None:
+        self._latest: dict[int, dict[str, Any]] = {}
+        self._subscribers: dict[int, set[asyncio.Queue[dict[str, Any]]]] = {}
+
+    def latest(self, job_id: int) -> Optional[dict[str, Any]]:
+        return self._latest.get(job_id)
+
+    def publish(self, job_id: int, /, **changes: Any) -> dict[str, Any]:
+        snapshot = {**self._latest.get(job_id, {"job_id": job_id}), **changes}
+        if snapshot.get("done"):
+            self._latest.pop(job_id, None)
+        else:
+            self._latest[job_id] = snapshot
+        for queue in self._subscribers.get(job_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+        return snapshot
+
+    async def subscribe(
+        self,
+        job_id: int,
+        initial: Optional[dict[str, Any]] = None,
+        reload: Optional[Callable[[], Awaitable[Optional[dict[str, Any]]]]] = None,
+    ) -> AsyncIterator[Optional[dict[str, Any]]]:
+        """Produit les états successifs du job, ou ``None`` après ``KEEPALIVE_SECONDS`` sans nouvelle.
+
+        Tant que le job n'est pas suivi par ce processus, ``reload`` relit son état en base toutes
+        les ``POLL_SECONDS`` ; un import lancé ailleurs progresse alors au rythme de ses commits.
+        """
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        timeout = POLL_SECONDS if reload is not None else KEEPALIVE_SECONDS
+        try:
+            snapshot = self._latest.get(job_id) or initial
+            if snapshot is not None:
+                yield snapshot
+                if snapshot.get("done"):
+                    return
+            idle = 0.0
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    if reload is not None and job_id not in self._latest:
+                        reloaded = await reload()
+                        if reloaded is None:
+                            return
+                        if reloaded != snapshot:
+                            snapshot = reloaded
+                            idle = 0.0
+                            yield snapshot
+                            if snapshot.get("done"):
+                                return
+                            continue
+                    idle += timeout
+                    if idle >= KEEPALIVE_SECONDS:
+                        idle = 0.0
+                        yield None
+                    continue
+                idle = 0.0
+                yield snapshot
+                if snapshot.get("done"):
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+
+progress_broker = ImportProgressBroker()
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import asyncio
+import math
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import case
+from sqlmodel import Session, delete, func, select, update
+
+from ..config import Settings, get_settings
+from ..database import get_session
+from ..models import ImportJob, SireneUsage, Site, SiteEstablishment
+from .geocoding import geocode_in_background
+from .planner import SITE_FILTER_KEYS, claim_imports, pending_imports, plan_imports
+from .progress import progress_broker
+from .sirene import SireneImporter
+
+# un site peut être rafraîchi en avance (à partir de 75 % de l'intervalle) s'il reste du quota,
+# ce qui étale sur la journée les sites créés ou importés en même temps
+EARLY_REFRESH_RATIO = 0.75
+
+
+# géocodages en cours par site : ils tournent à côté des imports sans les retarder
+_geocoding_tasks: dict[int, asyncio.Task] = {}
+
+
+def _start_geocoding(site_id: int, job_id: int) -> None:
+    """Lance le géocodage d'un site importé, à la suite de celui déjà en cours pour ce site."""
+    previous = _geocoding_tasks.get(site_id)
+
+    async def geocode() -> None:
+        try:
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
+            await geocode_in_background(get_session, site_id, job_id=job_id)
+        finally:
+            progress_broker.publish(job_id, done=True)
+            if _geocoding_tasks.get(site_id) is task:
+                del _geocoding_tasks[site_id]
+
+    task = asyncio.create_task(geocode())
+    _geocoding_tasks[site_id] = task
+
+
+async def wait_for_geocoding() -> None:
+    """Attend la fin des géocodages lancés par les imports (avant l'arrêt du processus)."""
+    while _geocoding_tasks:
+        await asyncio.gather(*_geocoding_tasks.values(), return_exceptions=True)
+
+
+async def run_pending_imports(window_seconds: float | None = None) -> None:
+    """Regroupe les jobs en attente en requêtes SIRENE partagées et les exécute l'une après l'autre.
+
+    Une courte fenêtre laisse arriver les jobs créés ensemble ; ceux créés pendant le
+    traitement sont planifiés au tour suivant. Les jobs sont réclamés avant exécution, ce qui
+    permet plusieurs workers. Le géocodage des établissements nouveaux ou déplacés part en
+    tâche de fond pour ne pas retarder les imports suivants.
+    """
+    if window_seconds is None:
+        window_seconds = get_settings().import_batch_window_seconds
+    await asyncio.sleep(window_seconds)
+    while True:
+        importer = SireneImporter()
+        try:
+            await _run_claimed_imports(importer)
+        finally:
+            await importer.close()
+        # un job créé pendant la fermeture de l'importeur n'a pas relancé de traitement (celui-ci
+        # n'était pas encore terminé) : il est repris ici, sans attente entre la vérification et la fin
+        with get_session() as session:
+            if not pending_imports(session):
+                return
+
+
+async def _run_claimed_imports(importer: SireneImporter) -> None:
+    while True:
+        with get_session() as session:
+            targets = claim_imports(session, pending_imports(session))
+            if not targets:
+                return
+            for plan in plan_imports(targets):
+                jobs = [(job.id, job.site_id) for job in plan.jobs]
+                try:
+                    await importer.import_planned(session, plan)
+                except Exception:  # pragma: no cover - l'erreur est enregistrée sur les jobs
+                    for job_id, _ in jobs:
+                        progress_broker.publish(job_id, done=True)
+                    continue
+                for job_id, site_id in jobs:
+                    _start_geocoding(site_id, job_id)
+
+
+class SiteRefresh:
+    """Site candidat au rafraîchissement, avec son coût estimé en requêtes SIRENE."""
+
+    __slots__ = ("site_id", "last_attempt_at", "establishments", "estimated_requests")
+
+    def __init__(
+        self, site_id: int, last_attempt_at: Optional[datetime], establishments: int, estimated_requests: int
+    ) -> None:
+        self.site_id = site_id
+        self.last_attempt_at = last_attempt_at
+        self.establishments = establishments
+        self.estimated_requests = estimated_requests
+
+    def staleness(self, now: datetime, interval: timedelta) -> float:
+        """Ancienneté de la dernière tentative en fraction de l'intervalle (infinie s'il n'y en a jamais eu)."""
+        if self.last_attempt_at is None:
+            return math.inf
+        return (now - self.last_attempt_at) / interval
+
+    def __repr__(self) -> str:
+        return f"SiteRefresh(site_id={self.site_id}, estimated_requests={self.estimated_requests})"
+
+
+def sirene_quotas(settings: Settings) -> tuple[int, int]:
+    """Quotas de requêtes SIRENE par jour et par heure (par défaut, le débit par minute sur 24 h)."""
+    daily_quota = settings.sirene_daily_quota or settings.sirene_rate_limit_per_minute * 60 * 24
+    return daily_quota, max(1, daily_quota // 24)
+
+
+def available_requests(session: Session, settings: Settings, now: datetime) -> int:
+    """Requêtes SIRENE encore disponibles : quota de l'heure glissante, lui-même borné par celui du jour.
+
+    La consommation est celle enregistrée par l'importeur (``SireneUsage``) : requêtes
+    réellement envoyées, imports manuels compris, une seule fois par requête partagée.
+    """
+    daily_quota, hourly_quota = sirene_quotas(settings)
+
+    def used_since(since: datetime) -> int:
+        return session.exec(
+            select(func.coalesce(func.sum(SireneUsage.requests), 0)).where(SireneUsage.recorded_at >= since)
+        ).one()
+
+    hourly_left = hourly_quota - used_since(now - timedelta(hours=1))
+    daily_left = daily_quota - used_since(now - timedelta(days=1))
+    return max(0, min(hourly_left, daily_left))
+
+
+def fail_stale_imports(session: Session, now: datetime, stale_after: timedelta) -> int:
+    """Marque en échec les imports ``running`` qui n'ont plus avancé depuis ``stale_after``.
+
+    Un import met son job à jour à chaque page : sans nouvelle depuis longtemps, son processus
+    s'est arrêté en cours de route. Le job reste daté de sa dernière page, qui compte comme
+    tentative ; sans cela, le site ne serait plus jamais rafraîchi.
+    """
+    result = session.exec(
+        update(ImportJob)
+        .where(ImportJob.status == "running", ImportJob.updated_at < now - stale_after)
+        .values(
+            status="failed",
+            last_error=f"Import interrompu : aucune page traitée pendant {stale_after.total_seconds() / 60:.0f} min",
+        )
+        .execution_options(synchronize_session=False)
+    )  # type: ignore[call-overload]
+    return result.rowcount
+
+
+def refresh_candidates(session: Session, settings: Settings) -> list[SiteRefresh]:
+    """Sites filtrés sans import en cours, avec la date de leur dernière tentative d'import et le
+    nombre de pages de leur dernier import réussi.
+
+    Un import échoué compte comme une tentative : le site attend l'intervalle suivant au lieu
+    d'être relancé (et de consommer du quota) à chaque passage.
+    """
+    busy = set(session.exec(select(ImportJob.site_id).where(ImportJob.status.in_(("pending", "running")))).all())
+    sizes = dict(
+        session.exec(select(SiteEstablishment.site_id, func.count()).group_by(SiteEstablishment.site_id)).all()
+    )
+    # une ligne par site, quel que soit l'historique : dernière tentative et pages du dernier succès
+    completed = ImportJob.status == "completed"
+    last_completed = (
+        select(ImportJob.site_id, func.max(ImportJob.updated_at).label("updated_at"))
+        .where(completed)
+        .group_by(ImportJob.site_id)
+        .subquery()
+    )
+    is_last_completed = completed & (ImportJob.updated_at == last_completed.c.updated_at)
+    history = {
+        site_id: (last_attempt_at, last_pages)
+        for site_id, last_attempt_at, last_pages in session.exec(
+            select(
+                ImportJob.site_id,
+                func.max(ImportJob.updated_at),
+                func.max(case((is_last_completed, ImportJob.pages_processed))),
+            )
+            .outerjoin(last_completed, last_completed.c.site_id == ImportJob.site_id)
+            .where(ImportJob.status.in_(("completed", "failed")))
+            .group_by(ImportJob.site_id)
+        )
+    }
+    page_size = settings.sirene_default_page_size
+    candidates = []
+    for site in session.exec(select(Site)):
+        # sans filtre propre, un import porterait sur tout le répertoire SIRENE
+        if site.id in busy or not any((site.sirene_filters or {}).get(key) for key in SITE_FILTER_KEYS):
+            continue
+        size = sizes.get(site.id, 0)
+        last_attempt_at, last_pages = history.get(site.id, (None, None))
+        pages = last_pages or math.ceil(size / page_size)
+        candidates.append(SiteRefresh(site.id, last_attempt_at, size, max(1, pages)))
+    return candidates
+
+
+def plan_refreshes(
+    candidates: list[SiteRefresh], now: datetime, interval: timedelta, budget: int, hourly_quota: int
+) -> list[SiteRefresh]:
+    """Choisit les sites à rafraîchir maintenant sans dépasser ``budget`` requêtes.
+
+    Les sites en retard passent d'abord, du plus ancien au plus récent puis du plus petit au
+    plus gros ; un site qui ne tient pas dans le budget laisse sa place aux suivants. Un site
+    plus gros que le quota horaire ne part que sur une heure encore intacte.
+    """
+    staleness = {candidate.site_id: candidate.staleness(now, interval) for candidate in candidates}
+    eligible = [candidate for candidate in candidates if staleness[candidate.site_id] >= EARLY_REFRESH_RATIO]
+    # en retard d'abord, puis les plus anciens, puis les moins coûteux
+    eligible.sort(
+        key=lambda candidate: (
+            staleness[candidate.site_id] < 1,
+            -staleness[candidate.site_id],
+            candidate.estimated_requests,
+        )
+    )
+    chosen = []
+    for candidate in eligible:
+        cost = candidate.estimated_requests
+        if cost <= budget or (cost > hourly_quota and budget >= hourly_quota and not chosen):
+            chosen.append(candidate)
+            budget -= cost
+        if budget <= 0:
+            break
+    return chosen
+
+
+async def run_scheduler(once: bool = False, report: Callable[[str], None] = print) -> None:
+    """Rafraîchit périodiquement tous les sites selon leur ancienneté, leur taille et le quota SIRENE."""
+    settings = get_settings()
+    interval = timedelta(hours=settings.refresh_interval_hours)
+    _, hourly_quota = sirene_quotas(settings)
+    while True:
+        now = datetime.utcnow()
+        with get_session() as session:
+            # au-delà du jour glissant, la consommation enregistrée ne sert plus
+            session.exec(delete(SireneUsage).where(SireneUsage.recorded_at < now - timedelta(days=1)))
+            interrupted = fail_stale_imports(session, now, timedelta(minutes=settings.import_stale_after_minutes))
+            budget = available_requests(session, settings, now)
+            chosen = plan_refreshes(refresh_candidates(session, settings), now, interval, budget, hourly_quota)
+            for refresh in chosen:
+                session.add(ImportJob(site_id=refresh.site_id))
+            session.commit()
+        if interrupted:
+            report(f"{now:%Y-%m-%d %H:%M} {interrupted} import(s) interrompu(s) marqué(s) en échec")
+        if chosen:
+            report(
+                f"{now:%Y-%m-%d %H:%M} rafraîchissement de {len(chosen)} site(s) "
+                f"(~{sum(refresh.estimated_requests for refresh in chosen)} requêtes sur {budget} disponibles) : "
+                + ", ".join(str(refresh.site_id) for refresh in chosen)
+            )
+            await run_pending_imports(window_seconds=0)
+        if once:
+            await wait_for_geocoding()
+            return
+        await asyncio.sleep(settings.scheduler_tick_seconds)
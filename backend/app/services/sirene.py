@@ -6,11 +6,157 @@ from datetime import datetime
 from typing import Any, AsyncIterator, Optional
 
 import httpx
-from sqlmodel import Session, select
+from sqlmodel import Session, SQLModel, select, update
 from tenacity import RetryError, retry, stop_after_attempt, wait_exponential
 
+from ..cache import bump_establishment_sites, bump_site_version
 from ..config import Settings, get_settings
-from ..models import Establishment, ImportJob, Site
+from ..database import bulk_insert
+from ..metrics import (
+    IMPORT_PAGE_COMMIT_SECONDS,
+    IMPORT_PAGE_UPSERT_SECONDS,
+    IMPORT_ROWS_TOTAL,
+    SIRENE_RATE_LIMIT_WAIT_SECONDS,
+    SIRENE_REQUEST_SECONDS,
+    SIRENE_RESPONSES_TOTAL,
+    SIRENE_RETRIES_TOTAL,
+)
+from ..models import (
+    ArchivedEstablishment,
+    ArchivedSiteEstablishment,
+    Establishment,
+    ImportJob,
+    SireneUsage,
+    Site,
+    SiteEstablishment,
+)
+from .archive import restore_establishments
+from .communes import get_commune_referential, normalize_name
+from .planner import PlannedImport, plan_imports
+from .profiling import PhaseTimings, profile_job
+from .progress import job_snapshot, progress_broker
+
+
+# seuls champs lus par l'importeur et le planificateur, extraits en mode mémoire bornée
+ESTABLISHMENT_FIELDS = frozenset(
+    {
+        "siren",
+        "nic",
+        "siret",
+        "etatAdministratifEtablissement",
+        "trancheEffectifsEtablissement",
+        "dateCreationEtablissement",
+        "activitePrincipaleEtablissement",
+        "nomenclatureActivitePrincipaleEtablissement",
+        "uniteLegale.denominationUniteLegale",
+    }
+)
+PERIOD_FIELDS = frozenset(
+    {
+        "numeroVoieEtablissement",
+        "indiceRepetitionEtablissement",
+        "typeVoieEtablissement",
+        "libelleVoieEtablissement",
+        "codePostalEtablissement",
+        "libelleCommuneEtablissement",
+        "codeCommuneEtablissement",
+        "codeDepartementEtablissement",
+    }
+)
+# colonnes rafraîchies quand SIRENE renvoie un SIRET déjà connu
+UPDATED_COLUMNS = (
+    "business_name",
+    "naf_code",
+    "naf_label",
+    "address",
+    "postal_code",
+    "city",
+    "department",
+    "is_active",
+    "closure_label",
+    "extra_metadata",
+)
+# colonnes dont la modification rend le géocodage obsolète
+GEOCODED_COLUMNS = ("address", "postal_code", "city")
+_NOT_GEOCODED = {"geo_lat": None, "geo_lon": None, "geo_status": None}
+_ITEM_PREFIX = "etablissements.item"
+_PERIOD_PREFIX = "etablissements.item.periodesEtablissement.item"
+_SCALAR_EVENTS = frozenset({"string", "number", "boolean", "null"})
+
+
+class IncrementalPageParser:
+    """Lit une page SIRENE morceau par morceau, événement par événement, sans construire le
+    document complet ni garder le corps de la réponse.
+
+    Seuls les champs mappés sont conservés, et seule la dernière période de chaque
+    établissement (celle utilisée pour l'adresse) est gardée.
+    """
+
+    def __init__(self) -> None:
+        try:
+            import ijson
+        except ImportError as exc:
+            raise RuntimeError(
+                "L'import en mémoire bornée nécessite ijson (pip install 'generateur-insee-backend[streaming]')"
+            ) from exc
+        self.etablissements: list[dict[str, Any]] = []
+        self.next_cursor: Optional[str] = None
+        self._current: Optional[dict[str, Any]] = None
+        self._period: Optional[dict[str, Any]] = None
+        self._events = ijson.sendable_list()
+        self._parser = ijson.parse_coro(self._events, use_float=True)
+
+    def feed(self, chunk: bytes) -> None:
+        if chunk:
+            self._parser.send(chunk)
+            self._consume()
+
+    def close(self) -> tuple[list[dict[str, Any]], Optional[str]]:
+        self._parser.close()
+        self._consume()
+        return self.etablissements, self.next_cursor
+
+    def _consume(self) -> None:
+        for prefix, event, value in self._events:
+            if prefix == _ITEM_PREFIX:
+                if event == "start_map":
+                    self._current, self._period = {}, None
+                elif event == "end_map" and self._current is not None:
+                    self._current["periodesEtablissement"] = [self._period] if self._period is not None else []
+                    self.etablissements.append(self._current)
+                    self._current = None
+            elif prefix == _PERIOD_PREFIX:
+                if event == "start_map":
+                    self._period = {}
+            elif self._current is not None and event in _SCALAR_EVENTS:
+                if prefix.startswith(_PERIOD_PREFIX):
+                    field = prefix[len(_PERIOD_PREFIX) + 1 :]
+                    if self._period is not None and field in PERIOD_FIELDS:
+                        self._period[field] = value
+                else:
+                    field = prefix[len(_ITEM_PREFIX) + 1 :]
+                    if field == "uniteLegale.denominationUniteLegale":
+                        self._current["uniteLegale"] = {"denominationUniteLegale": value}
+                    elif field in ESTABLISHMENT_FIELDS:
+                        self._current[field] = value
+            elif prefix == "curseurSuivant" and event in _SCALAR_EVENTS:
+                self.next_cursor = value
+        del self._events[:]
+
+
+def parse_page_incrementally(body: bytes) -> tuple[list[dict[str, Any]], Optional[str]]:
+    """Analyse une page déjà reçue avec ``IncrementalPageParser``."""
+    parser = IncrementalPageParser()
+    parser.feed(body)
+    return parser.close()
+
+
+def _location_changed(previous: list[Optional[str]], current: list[Optional[str]]) -> bool:
+    # les noms de commune sont comparés sans casse ni accents : la normalisation par le
+    # référentiel des communes ne doit pas provoquer de regéocodage
+    return any(
+        normalize_name(before or "") != normalize_name(after or "") for before, after in zip(previous, current)
+    )
 
 
 class RateLimiter:
@@ -21,6 +167,10 @@ class RateLimiter:
         self._lock = asyncio.Lock()
 
     async def acquire(self) -> None:
+        with SIRENE_RATE_LIMIT_WAIT_SECONDS.time():
+            await self._acquire()
+
+    async def _acquire(self) -> None:
         async with self._lock:
             loop = asyncio.get_event_loop()
             while True:
@@ -43,6 +193,8 @@ class SireneClient:
             timeout=httpx.Timeout(30.0, read=30.0, write=30.0, connect=10.0),
         )
         self.rate_limiter = RateLimiter(self.settings.sirene_rate_limit_per_minute)
+        # requêtes envoyées, réponses 429 et tentatives répétées comprises
+        self.requests_sent = 0
 
     async def close(self) -> None:
         await self._client.aclose()
@@ -70,33 +222,91 @@ class SireneClient:
         payload = token_resp.json()
         self._token = payload["access_token"]
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=30), stop=stop_after_attempt(3))
-    async def _get(self, path: str, params: dict[str, Any]) -> httpx.Response:
-        await self.rate_limiter.acquire()
+    @retry(
+        wait=wait_exponential(multiplier=1, min=1, max=30),
+        stop=stop_after_attempt(3),
+        before_sleep=lambda _: SIRENE_RETRIES_TOTAL.inc(),
+    )
+    async def _get(
+        self, path: str, params: dict[str, Any], timings: PhaseTimings | None = None
+    ) -> httpx.Response:
+        timings = timings or PhaseTimings()
+        with timings.measure("rate_limit"):
+            await self.rate_limiter.acquire()
         headers = await self._get_auth_headers()
-        response = await self._client.get(path, headers=headers, params=params)
+        self.requests_sent += 1
+        with SIRENE_REQUEST_SECONDS.time(), timings.measure("http"):
+            response = await self._client.get(path, headers=headers, params=params)
+        SIRENE_RESPONSES_TOTAL.labels(str(response.status_code)).inc()
         if response.status_code == 429:
             raise httpx.HTTPStatusError("Rate limit", request=response.request, response=response)
         response.raise_for_status()
         return response
 
+    @retry(
+        wait=wait_exponential(multiplier=1, min=1, max=30),
+        stop=stop_after_attempt(3),
+        before_sleep=lambda _: SIRENE_RETRIES_TOTAL.inc(),
+    )
+    async def _get_page_streamed(
+        self, path: str, params: dict[str, Any], timings: PhaseTimings | None = None
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        """Page analysée au fil de sa réception : seul un morceau du corps est en mémoire à la fois.
+
+        Une coupure en cours de lecture relance la page entière.
+        """
+        timings = timings or PhaseTimings()
+        with timings.measure("rate_limit"):
+            await self.rate_limiter.acquire()
+        headers = await self._get_auth_headers()
+        self.requests_sent += 1
+        request = self._client.build_request("GET", path, headers=headers, params=params)
+        with SIRENE_REQUEST_SECONDS.time(), timings.measure("http"):
+            response = await self._client.send(request, stream=True)
+        try:
+            SIRENE_RESPONSES_TOTAL.labels(str(response.status_code)).inc()
+            if response.status_code == 429:
+                raise httpx.HTTPStatusError("Rate limit", request=response.request, response=response)
+            response.raise_for_status()
+            parser = IncrementalPageParser()
+            chunks = response.aiter_bytes()
+            while True:
+                with timings.measure("http"):
+                    chunk = await anext(chunks, None)
+                if chunk is None:
+                    break
+                with timings.measure("parse"):
+                    parser.feed(chunk)
+            with timings.measure("parse"):
+                return parser.close()
+        finally:
+            await response.aclose()
+
     async def iter_establishments(
         self,
         filters: dict[str, Any],
         page_size: int | None = None,
         start_cursor: str | None = None,
+        timings: PhaseTimings | None = None,
     ) -> AsyncIterator[tuple[list[dict[str, Any]], Optional[str]]]:
+        timings = timings or PhaseTimings()
         cursor = start_cursor or "*"
         while cursor:
             params = {"nombre": page_size or self.settings.sirene_default_page_size, "curseur": cursor}
             params.update(filters)
             try:
-                response = await self._get("/etablissements", params=params)
+                if self.settings.import_bounded_memory:
+                    etablissements, next_cursor = await self._get_page_streamed(
+                        "/etablissements", params=params, timings=timings
+                    )
+                else:
+                    response = await self._get("/etablissements", params=params, timings=timings)
+                    with timings.measure("parse"):
+                        payload = response.json()
+                    etablissements = payload.get("etablissements", [])
+                    next_cursor = payload.get("curseurSuivant")
             except RetryError as exc:  # pragma: no cover - safety
                 raise exc.last_attempt.exception()  # type: ignore[misc]
-            payload = response.json()
-            etablissements = payload.get("etablissements", [])
-            next_cursor = payload.get("curseurSuivant")
             yield etablissements, next_cursor
             if not next_cursor or next_cursor == cursor:
                 break
@@ -107,79 +317,136 @@ class SireneImporter:
     def __init__(self, settings: Settings | None = None) -> None:
         self.settings = settings or get_settings()
         self.client = SireneClient(self.settings)
+        self.communes = get_commune_referential()
+        self._requests_recorded = 0
+
+    async def close(self) -> None:
+        await self.client.close()
 
     async def import_for_site(self, session: Session, job: ImportJob) -> ImportJob:
         site = session.get(Site, job.site_id)
         if not site:
             raise ValueError("Site introuvable")
 
-        filters = self._build_filters(site, job)
-        job.status = "running"
-        job.updated_at = datetime.utcnow()
-        session.add(job)
-        session.commit()
-        session.refresh(job)
+        try:
+            await self.import_planned(session, plan_imports([(job, site)])[0])
+        finally:
+            await self.close()
+        return job
 
-        total_imported = job.total_imported
-        total_closed = job.total_closed
-        total_errors = job.total_errors
+    async def import_planned(self, session: Session, plan: PlannedImport) -> list[ImportJob]:
+        """Exécute une requête planifiée et rattache chaque établissement aux sites qu'il concerne.
+
+        Le client n'est pas fermé : un même importeur enchaîne les requêtes d'un plan en
+        partageant son limiteur de débit.
+        """
+        jobs = plan.jobs
+        profiling = any(job.profile for job in jobs) or self.settings.import_profiling
+        with profile_job(jobs[0], self.settings.import_profile_dir, profiling) as profile_path:
+            for job in jobs:
+                job.status = "running"
+                job.updated_at = datetime.utcnow()
+                if profile_path:
+                    job.profile_path = str(profile_path)
+                session.add(job)
+            session.commit()
+            for job in jobs:
+                session.refresh(job)
+                progress_broker.publish(job.id, **job_snapshot(job), pages=0, rows_per_second=0.0)
+            return await self._run_import(session, plan)
+
+    async def _run_import(self, session: Session, plan: PlannedImport) -> list[ImportJob]:
+        jobs = plan.jobs
+        # un job seul peut reprendre à son curseur ; une requête partagée repart du début
+        start_cursor = jobs[0].cursor if len(jobs) == 1 else None
+        # le parcours SIRENE est commun : tous les jobs du plan reçoivent les mêmes temps
+        timings = PhaseTimings(jobs[0])
 
         try:
             async for etablissements, cursor in self.client.iter_establishments(
-                filters=filters, start_cursor=job.cursor
+                filters=plan.params, start_cursor=start_cursor, timings=timings
             ):
-                for etablissement in etablissements:
-                    try:
-                        imported, closed = self._upsert_establishment(session, site.id, etablissement)
-                        total_imported += imported
-                        total_closed += closed
-                    except Exception as exc:  # pragma: no cover - logging placeholder
-                        total_errors += 1
-                        job.last_error = str(exc)
-                session.commit()
-                job.cursor = cursor
-                job.total_imported = total_imported
-                job.total_closed = total_closed
-                job.total_errors = total_errors
-                job.updated_at = datetime.utcnow()
-                session.add(job)
+                with IMPORT_PAGE_UPSERT_SECONDS.time(), timings.measure("upsert"):
+                    entries: list[tuple[dict[str, Any], list[tuple[ImportJob, Site]]]] = []
+                    for etablissement in etablissements:
+                        targets = plan.route(etablissement)
+                        if not targets:
+                            IMPORT_ROWS_TOTAL.labels("unmatched").inc()
+                            continue
+                        try:
+                            entries.append((self._map_establishment(etablissement), targets))
+                        except Exception as exc:  # pragma: no cover - logging placeholder
+                            for job, _ in targets:
+                                job.total_errors += 1
+                                job.last_error = str(exc)
+                            IMPORT_ROWS_TOTAL.labels("error").inc()
+                    stored = self._store_page(
+                        session, [(values, [site.id for _, site in targets]) for values, targets in entries]
+                    )
+                    for (values, targets), (_, linked_site_ids, result) in zip(entries, stored):
+                        IMPORT_ROWS_TOTAL.labels(result).inc()
+                        closed = 0 if values["is_active"] else 1
+                        for job, site in targets:
+                            if site.id in linked_site_ids:
+                                job.total_imported += 1
+                                linked_site_ids.discard(site.id)
+                            job.total_closed += closed
+                    bump_establishment_sites(session, [establishment_id for establishment_id, _, _ in stored])
+                with IMPORT_PAGE_COMMIT_SECONDS.time(), timings.measure("commit"):
+                    session.commit()
+                timings.pages += 1
+                timings.rows += len(etablissements)
+                for job in jobs:
+                    job.cursor = cursor
+                    job.updated_at = datetime.utcnow()
+                    timings.store(job)
+                    session.add(job)
+                self._record_usage(session)
                 session.commit()
+                for job in jobs:
+                    progress_broker.publish(
+                        job.id,
+                        **job_snapshot(job),
+                        pages=timings.pages,
+                        rows_per_second=job.rows_per_second,
+                    )
                 if not cursor:
                     break
 
-            job.status = "completed"
-            job.updated_at = datetime.utcnow()
-            session.add(job)
+            for job in jobs:
+                job.status = "completed"
+                job.updated_at = datetime.utcnow()
+                timings.store(job)
+                session.add(job)
             session.commit()
-            return job
+            for job in jobs:
+                progress_broker.publish(job.id, status=job.status)
+            return jobs
         except Exception as exc:
-            job.status = "failed"
-            job.last_error = str(exc)
-            job.updated_at = datetime.utcnow()
-            session.add(job)
+            for job in jobs:
+                job.status = "failed"
+                job.last_error = str(exc)
+                job.updated_at = datetime.utcnow()
+                timings.store(job)
+                session.add(job)
+            self._record_usage(session)
             session.commit()
+            for job in jobs:
+                progress_broker.publish(job.id, status=job.status, last_error=job.last_error)
             raise
-        finally:
-            await self.client.close()
 
-    def _build_filters(self, site: Site, job: ImportJob) -> dict[str, Any]:
-        filters: dict[str, Any] = {
-            "statutDiffusion": "O",
-            "etatAdministratifEtablissement": "A,B,F",
-        }
-        sirene_filters = site.sirene_filters or {}
-        for key in ["codeNaf", "codePostalEtablissement", "codeCommuneEtablissement", "codeDepartementEtablissement"]:
-            if value := sirene_filters.get(key):
-                filters[key] = value
-        if job.naf_code:
-            filters["codeNaf"] = job.naf_code
-        if job.department:
-            filters["codeDepartementEtablissement"] = job.department
-        if job.city:
-            filters["codeCommuneEtablissement"] = job.city
-        return filters
-
-    def _upsert_establishment(self, session: Session, site_id: int, payload: dict[str, Any]) -> tuple[int, int]:
+    def _record_usage(self, session: Session) -> None:
+        """Ajoute à la transaction les requêtes envoyées depuis le dernier enregistrement.
+
+        Une requête partagée par plusieurs jobs n'est comptée qu'une fois, et un job repris
+        ne recompte pas les pages de ses exécutions précédentes.
+        """
+        requests = self.client.requests_sent - self._requests_recorded
+        if requests:
+            session.add(SireneUsage(requests=requests))
+            self._requests_recorded = self.client.requests_sent
+
+    def _map_establishment(self, payload: dict[str, Any]) -> dict[str, Any]:
         siret = payload.get("siret")
         if not siret:
             raise ValueError("SIRET manquant")
@@ -192,53 +459,160 @@ class SireneImporter:
             current.get("typeVoieEtablissement"),
             current.get("libelleVoieEtablissement"),
         ]
-        address = " ".join(str(part) for part in address_parts if part).strip() or None
+        is_active = payload.get("etatAdministratifEtablissement", "A") == "A"
+        postal_code = current.get("codePostalEtablissement")
+        city = current.get("libelleCommuneEtablissement")
+        department = current.get("codeDepartementEtablissement")
+        if self.communes and (
+            commune := self.communes.resolve(current.get("codeCommuneEtablissement"), postal_code, city)
+        ):
+            # nom officiel et département du référentiel plutôt que les libellés SIRENE
+            city, department = commune.name, commune.department
+        return {
+            "siren": payload.get("siren"),
+            "nic": payload.get("nic"),
+            "siret": siret,
+            "business_name": payload.get("uniteLegale", {}).get("denominationUniteLegale"),
+            "naf_code": payload.get("activitePrincipaleEtablissement"),
+            "naf_label": payload.get("nomenclatureActivitePrincipaleEtablissement"),
+            "address": " ".join(str(part) for part in address_parts if part).strip() or None,
+            "postal_code": postal_code,
+            "city": city,
+            "department": department,
+            "is_active": is_active,
+            "closure_label": None if is_active else "Définitivement fermé",
+            "extra_metadata": {
+                "trancheEffectifs": payload.get("trancheEffectifsEtablissement"),
+                "dateCreation": payload.get("dateCreationEtablissement"),
+            },
+        }
 
-        db_establishment = session.exec(
-            select(Establishment).where(Establishment.siret == siret, Establishment.site_id == site_id)
-        ).one_or_none()
+    @staticmethod
+    def _archived_ids(session: Session, sirets: list[str]) -> dict[str, int]:
+        if not sirets:
+            return {}
+        return dict(
+            session.exec(
+                select(ArchivedEstablishment.siret, ArchivedEstablishment.id).where(
+                    ArchivedEstablishment.siret.in_(sirets)
+                )
+            ).all()
+        )
 
-        is_active = payload.get("etatAdministratifEtablissement", "A") == "A"
-        closure_label = None if is_active else "Définitivement fermé"
+    @staticmethod
+    def _link(
+        session: Session, link_model: type[SQLModel], wanted: set[tuple[int, int]], now: datetime
+    ) -> set[tuple[int, int]]:
+        """Crée les rattachements site/établissement manquants et renvoie ceux qui ont été ajoutés."""
+        if not wanted:
+            return set()
+        existing = set(
+            session.exec(
+                select(link_model.site_id, link_model.establishment_id)  # type: ignore[attr-defined]
+                .where(link_model.establishment_id.in_({establishment_id for _, establishment_id in wanted}))  # type: ignore[attr-defined]
+                .where(link_model.site_id.in_({site_id for site_id, _ in wanted}))  # type: ignore[attr-defined]
+            ).all()
+        )
+        linked = wanted - existing
+        bulk_insert(
+            session,
+            link_model,
+            [
+                {"site_id": site_id, "establishment_id": establishment_id, "created_at": now}
+                for site_id, establishment_id in sorted(linked)
+            ],
+        )
+        return linked
 
-        metadata = {
-            "trancheEffectifs": payload.get("trancheEffectifsEtablissement"),
-            "dateCreation": payload.get("dateCreationEtablissement"),
-        }
+    def _store_page(
+        self, session: Session, entries: list[tuple[dict[str, Any], list[int]]]
+    ) -> list[tuple[int, set[int], str]]:
+        """Écrit une page en requêtes groupées : une ligne unique par SIRET, rattachée aux sites.
 
-        if db_establishment:
-            db_establishment.business_name = payload.get("uniteLegale", {}).get("denominationUniteLegale")
-            db_establishment.naf_code = payload.get("activitePrincipaleEtablissement")
-            db_establishment.naf_label = payload.get("nomenclatureActivitePrincipaleEtablissement")
-            db_establishment.address = address
-            db_establishment.postal_code = current.get("codePostalEtablissement")
-            db_establishment.city = current.get("libelleCommuneEtablissement")
-            db_establishment.department = current.get("codeDepartementEtablissement")
-            db_establishment.is_active = is_active
-            db_establishment.closure_label = closure_label
-            db_establishment.last_seen_at = datetime.utcnow()
-            db_establishment.extra_metadata = metadata
-            session.add(db_establishment)
-            imported = 0
-        else:
-            db_establishment = Establishment(
-                site_id=site_id,
-                siren=payload.get("siren"),
-                nic=payload.get("nic"),
-                siret=siret,
-                business_name=payload.get("uniteLegale", {}).get("denominationUniteLegale"),
-                naf_code=payload.get("activitePrincipaleEtablissement"),
-                naf_label=payload.get("nomenclatureActivitePrincipaleEtablissement"),
-                address=address,
-                postal_code=current.get("codePostalEtablissement"),
-                city=current.get("libelleCommuneEtablissement"),
-                department=current.get("codeDepartementEtablissement"),
-                is_active=is_active,
-                closure_label=closure_label,
-                extra_metadata=metadata,
+        Renvoie, pour chaque entrée, l'identifiant de l'établissement, les sites auxquels il
+        vient d'être rattaché et l'écriture effectuée : ``inserted`` (nouvelle ligne),
+        ``updated`` (ligne existante ou réintégrée depuis l'archive) ou ``archived`` (resté
+        dans l'archive). Un établissement déjà connu d'un autre site n'est ni recréé ni
+        géocodé une seconde fois.
+        """
+        if not entries:
+            return []
+        now = datetime.utcnow()
+        page = {values["siret"]: values for values, _ in entries}
+        known = {}
+        moved: set[str] = set()
+        for siret, establishment_id, closed_at, *location in session.exec(
+            select(
+                Establishment.siret,
+                Establishment.id,
+                Establishment.closed_at,
+                *(getattr(Establishment, column) for column in GEOCODED_COLUMNS),
+            ).where(Establishment.siret.in_(page))
+        ):
+            known[siret] = (establishment_id, closed_at)
+            if _location_changed(location, [page[siret][column] for column in GEOCODED_COLUMNS]):
+                moved.add(siret)
+        archived = self._archived_ids(session, [siret for siret in page if siret not in known])
+        reopened = {siret: archived.pop(siret) for siret in list(archived) if page[siret]["is_active"]}
+        if reopened:
+            restore_establishments(session, reopened.values())
+            known.update({siret: (establishment_id, None) for siret, establishment_id in reopened.items()})
+
+        updates = [
+            {
+                "id": known[siret][0],
+                **{key: values[key] for key in UPDATED_COLUMNS},
+                "closed_at": None if values["is_active"] else known[siret][1] or now,
+                "last_seen_at": now,
+                # adresse modifiée : coordonnées effacées pour être regéocodées après l'import
+                **(_NOT_GEOCODED if siret in moved else {}),
+            }
+            for siret, values in page.items()
+            if siret in known
+        ]
+        if updates:
+            session.exec(update(Establishment), params=updates)  # type: ignore[call-overload]
+        ids = {siret: establishment_id for siret, (establishment_id, _) in known.items()}
+        new_rows = [
+            {**values, "closed_at": None if values["is_active"] else now, "imported_at": now, "last_seen_at": now}
+            for siret, values in page.items()
+            if siret not in known and siret not in archived
+        ]
+        if new_rows:
+            bulk_insert(session, Establishment, new_rows)
+            ids.update(
+                session.exec(
+                    select(Establishment.siret, Establishment.id).where(
+                        Establishment.siret.in_([row["siret"] for row in new_rows])
+                    )
+                ).all()
             )
-            session.add(db_establishment)
-            imported = 1
 
-        closed = 1 if not is_active else 0
-        return imported, closed
+        # un établissement archivé toujours fermé reste froid : seul son rattachement est enregistré
+        cold_links = {
+            (site_id, archived[values["siret"]])
+            for values, site_ids in entries
+            if values["siret"] in archived
+            for site_id in site_ids
+        }
+        for site_id in {site_id for site_id, _ in self._link(session, ArchivedSiteEstablishment, cold_links, now)}:
+            bump_site_version(session, site_id)
+        hot_links = {
+            (site_id, ids[values["siret"]]) for values, site_ids in entries if values["siret"] in ids for site_id in site_ids
+        }
+        linked = self._link(session, SiteEstablishment, hot_links, now)
+
+        # un SIRET répété dans la page n'est inséré qu'une fois : les entrées suivantes le mettent à jour
+        inserted = {row["siret"] for row in new_rows}
+        results = []
+        for values, site_ids in entries:
+            if values["siret"] in archived:
+                results.append((archived[values["siret"]], set(), "archived"))
+                continue
+            establishment_id = ids[values["siret"]]
+            new_site_ids = {site_id for site_id in site_ids if (site_id, establishment_id) in linked}
+            linked -= {(site_id, establishment_id) for site_id in new_site_ids}
+            result = "inserted" if values["siret"] in inserted else "updated"
+            inserted.discard(values["siret"])
+            results.append((establishment_id, new_site_ids, result))
+        return results
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import gzip
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterator, Optional
+from xml.sax.saxutils import escape
+
+from sqlmodel import Session, select
+
+from ..models import Establishment, ManualPage, Site, SiteEstablishment
+
+SITEMAP_MAX_URLS = 50_000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024  # limite du protocole, taille non compressée
+STREAM_BATCH_SIZE = 1000
+
+ESTABLISHMENT_PATH = "/etablissements/{siret}"
+PAGE_PATH = "/{slug}"
+
+_URLSET_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+_URLSET_CLOSE = "</urlset>\n"
+_INDEX_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+_INDEX_CLOSE = "</sitemapindex>\n"
+
+
+def _format_lastmod(value: Optional[datetime]) -> str:
+    return f"<lastmod>{value.strftime('%Y-%m-%dT%H:%M:%S+00:00')}</lastmod>" if value else ""
+
+
+class _Shard:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.urls = 0
+        self.size = len(_URLSET_OPEN) + len(_URLSET_CLOSE)
+        self.lastmod: Optional[datetime] = None
+        self._handle: IO[str] = gzip.open(path, "wt", encoding="utf-8")
+        self._handle.write(_URLSET_OPEN)
+
+    def fits(self, entry: str, max_urls: int) -> bool:
+        return self.urls < max_urls and self.size + len(entry.encode("utf-8")) <= SITEMAP_MAX_BYTES
+
+    def write(self, entry: str, lastmod: Optional[datetime]) -> None:
+        self._handle.write(entry)
+        self.urls += 1
+        self.size += len(entry.encode("utf-8"))
+        if lastmod and (self.lastmod is None or lastmod > self.lastmod):
+            self.lastmod = lastmod
+
+    def close(self) -> None:
+        self._handle.write(_URLSET_CLOSE)
+        self._handle.close()
+
+
+class SitemapGenerator:
+    """Écrit les sitemaps d'un site en flux, par fichiers gzip d'au plus ``max_urls`` URLs."""
+
+    def __init__(
+        self,
+        session: Session,
+        base_url: str,
+        output_dir: Path | str,
+        max_urls: int = SITEMAP_MAX_URLS,
+        batch_size: int = STREAM_BATCH_SIZE,
+        include_closed: bool = False,
+    ) -> None:
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.output_dir = Path(output_dir)
+        self.max_urls = min(max_urls, SITEMAP_MAX_URLS)
+        self.batch_size = batch_size
+        self.include_closed = include_closed
+        self.shards: list[_Shard] = []
+
+    @property
+    def total_urls(self) -> int:
+        return sum(shard.urls for shard in self.shards)
+
+    def generate(self, site_id: int) -> Path:
+        site = self.session.get(Site, site_id)
+        if not site:
+            raise ValueError("Site introuvable")
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shards = []
+        current: Optional[_Shard] = None
+        try:
+            for location, lastmod in self._iter_urls(site_id):
+                entry = f"<url><loc>{escape(location)}</loc>{_format_lastmod(lastmod)}</url>\n"
+                if current is None or not current.fits(entry, self.max_urls):
+                    if current is not None:
+                        current.close()
+                    current = self._open_shard(site.slug)
+                current.write(entry, lastmod)
+        finally:
+            if current is not None:
+                current.close()
+
+        return self._write_index(site.slug)
+
+    def _open_shard(self, slug: str) -> _Shard:
+        shard = _Shard(self.output_dir / f"sitemap-{slug}-{len(self.shards) + 1}.xml.gz")
+        self.shards.append(shard)
+        return shard
+
+    def _write_index(self, slug: str) -> Path:
+        index_path = self.output_dir / f"sitemap-{slug}.xml"
+        with index_path.open("w", encoding="utf-8") as handle:
+            handle.write(_INDEX_OPEN)
+            for shard in self.shards:
+                location = escape(f"{self.base_url}/{shard.path.name}")
+                handle.write(f"<sitemap><loc>{location}</loc>{_format_lastmod(shard.lastmod)}</sitemap>\n")
+            handle.write(_INDEX_CLOSE)
+        return index_path
+
+    def _iter_urls(self, site_id: int) -> Iterator[tuple[str, Optional[datetime]]]:
+        pages = (
+            select(ManualPage.slug, ManualPage.updated_at)
+            .where(ManualPage.site_id == site_id)
+            .order_by(ManualPage.id)
+            .execution_options(stream_results=True, yield_per=self.batch_size)
+        )
+        for slug, updated_at in self.session.exec(pages):
+            yield self.base_url + PAGE_PATH.format(slug=slug), updated_at
+
+        establishments = (
+            select(Establishment.siret, Establishment.last_seen_at)
+            .join(SiteEstablishment, SiteEstablishment.establishment_id == Establishment.id)
+            .where(SiteEstablishment.site_id == site_id)
+            .order_by(Establishment.id)
+            .execution_options(stream_results=True, yield_per=self.batch_size)
+        )
+        if not self.include_closed:
+            establishments = establishments.where(Establishment.is_active == True)  # noqa: E712
+        for siret, last_seen_at in self.session.exec(establishments):
+            yield self.base_url + ESTABLISHMENT_PATH.format(siret=siret), last_seen_at
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from string import Formatter
+from typing import Any, Iterable, Iterator, Mapping
+
+from sqlmodel import Session, func, select
+
+from ..models import Establishment, Site, SiteEstablishment
+
+# variables fournies par le rendu en lot selon la portée du template
+SCOPE_VARIABLES = {
+    "city": ("site", "ville", "departement", "codes_postaux", "nombre_etablissements"),
+    "postal_code": ("site", "code_postal", "ville", "departement", "nombre_etablissements"),
+}
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class CompiledTemplate:
+    """Template de prompt analysé une seule fois : variables déclarées et rendu sans ré-analyse.
+
+    La syntaxe est celle de ``str.format`` limitée aux champs nommés (``{ville}``, ``{nombre:>3}``).
+    """
+
+    __slots__ = ("source", "variables", "_format", "_values", "_formatted")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        try:
+            parsed = list(Formatter().parse(source))
+        except ValueError as exc:
+            raise TemplateError(f"Template invalide : {exc}") from exc
+        pieces: list[str] = []
+        fields: list[str] = []
+        formatted: list[tuple[int, str, str | None, str]] = []
+        for literal, field, spec, conversion in parsed:
+            pieces.append(literal.replace("%", "%%"))
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise TemplateError(f"Variable invalide : {{{field}}} (nom simple attendu, par exemple {{ville}})")
+            if conversion not in (None, "r", "s", "a"):
+                raise TemplateError(f"Conversion inconnue !{conversion} pour {{{field}}}")
+            if spec and "{" in spec:
+                raise TemplateError(f"Format imbriqué non pris en charge pour {{{field}}}")
+            if conversion or spec:
+                formatted.append((len(fields), field, conversion, spec or ""))
+            fields.append(field)
+            pieces.append("%s")
+        self.variables = tuple(dict.fromkeys(fields))
+        self._format = "".join(pieces)
+        self._formatted = formatted
+        # itemgetter renvoie un scalaire pour un seul champ : on garde toujours un tuple
+        if not fields:
+            self._values = lambda variables: ()
+        elif len(fields) == 1:
+            getter = itemgetter(fields[0])
+            self._values = lambda variables: (getter(variables),)
+        else:
+            self._values = itemgetter(*fields)
+
+    def missing(self, available: Iterable[str]) -> list[str]:
+        available = set(available)
+        return [name for name in self.variables if name not in available]
+
+    def render(self, variables: Mapping[str, Any]) -> str:
+        try:
+            values = self._values(variables)
+        except KeyError:
+            raise TemplateError(f"Variables manquantes : {', '.join(self.missing(variables))}") from None
+        if self._formatted:
+            values = list(values)
+            for index, name, conversion, spec in self._formatted:
+                value = values[index]
+                if conversion == "r":
+                    value = repr(value)
+                elif conversion == "a":
+                    value = ascii(value)
+                elif conversion == "s":
+                    value = str(value)
+                try:
+                    values[index] = format(value, spec)
+                except ValueError as exc:
+                    raise TemplateError(f"Format invalide pour {{{name}}} : {exc}") from None
+            values = tuple(values)
+        return self._format % values
+
+    def render_many(self, rows: Iterable[Mapping[str, Any]]) -> Iterator[str]:
+        """Rend un flux de jeux de variables ; une ligne incomplète lève ``TemplateError`` avec son rang."""
+        render = self.render
+        for index, variables in enumerate(rows):
+            try:
+                yield render(variables)
+            except TemplateError as exc:
+                raise TemplateError(f"Ligne {index} : {exc}") from None
+
+
+@lru_cache(maxsize=256)
+def compile_template(source: str) -> CompiledTemplate:
+    return CompiledTemplate(source)
+
+
+def iter_scope_variables(session: Session, site: Site, scope: str, batch_size: int = 5000) -> Iterator[dict[str, Any]]:
+    """Variables de chaque ville ou code postal du site, agrégées à partir des établissements actifs."""
+    if scope not in SCOPE_VARIABLES:
+        raise TemplateError(f"Pas de rendu en lot pour la portée {scope}")
+    key = Establishment.city if scope == "city" else Establishment.postal_code
+    statement = (
+        select(Establishment.city, Establishment.postal_code, Establishment.department, func.count())
+        .join(SiteEstablishment, SiteEstablishment.establishment_id == Establishment.id)
+        .where(SiteEstablishment.site_id == site.id)
+        .where(Establishment.is_active == True)  # noqa: E712
+        .where(key.is_not(None))
+        .group_by(Establishment.city, Establishment.postal_code, Establishment.department)
+        .order_by(key, Establishment.city, Establishment.postal_code)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    position = 0 if scope == "city" else 1
+    for value, group in groupby(session.exec(statement), key=itemgetter(position)):
+        rows = list(group)
+        departments = sorted({row[2] for row in rows if row[2]})
+        variables = {
+            "site": site.name,
+            "departement": ", ".join(departments),
+            "nombre_etablissements": sum(row[3] for row in rows),
+        }
+        if scope == "city":
+            variables.update(ville=value, codes_postaux=", ".join(sorted({row[1] for row in rows if row[1]})))
+        else:
+            variables.update(code_postal=value, ville=", ".join(sorted({row[0] for row in rows if row[0]})))
+        yield variables
@@ -0,0 +1,223 @@
+"""Lectures de l'API pendant un import massif, avec et sans le profil de base de données.
+
+Vérifie que les lectures ne rencontrent pas « database is locked » et que l'import aboutit.
+En plus des lecteurs de l'API, une lecture longue (comme un export) garde une transaction
+ouverte plus longtemps que le délai d'attente par défaut de SQLite : sans WAL, elle bloque
+les commits de l'importeur. Chaque profil est exécuté dans un processus distinct sur une
+base SQLite neuve (ou sur ``--database-url``, par exemple PostgreSQL, où le profil active
+aussi COPY). ``tests/test_concurrency.py`` rejoue ce scénario en plus petit.
+
+Usage depuis le dossier ``backend`` ::
+
+    python -m benchmarks.concurrency --rows 200000 --readers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from .e2e import percentile
+from .fakes import create_sirene_app, serve
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PROFILES = {"tuned": "true", "bare": "false"}
+# au-delà des 5 s d'attente par défaut du pilote sqlite3 (profil désactivé)
+LONG_READ_SECONDS = 6.0
+
+
+def run_worker(readers: int, long_read_seconds: float = LONG_READ_SECONDS) -> dict[str, Any]:
+    from fastapi.testclient import TestClient
+    from sqlalchemy.exc import OperationalError
+
+    from app.database import get_engine, get_session, init_db
+    from app.main import app
+    from app.models import ImportJob, Site
+    from app.services.sirene import SireneImporter
+
+    init_db()
+    with get_session() as session:
+        site = Site(name="Concurrence", slug=f"concurrence-{time.time_ns()}")
+        session.add(site)
+        session.commit()
+        job = ImportJob(site_id=site.id)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        site_id, job_id = site.id, job.id
+
+    importing = threading.Event()
+    importing.set()
+    finished = threading.Event()
+    latencies: list[float] = []
+    errors: list[str] = []
+    lock = threading.Lock()
+
+    def read_loop() -> None:
+        with TestClient(app) as client:
+            while importing.is_set():
+                start = time.perf_counter()
+                try:
+                    response = client.get(f"/sites/{site_id}/establishments/", params={"active": True})
+                    failure = None if response.status_code == 200 else f"HTTP {response.status_code}"
+                except OperationalError as exc:
+                    failure = str(exc.orig)
+                except Exception as exc:  # pragma: no cover - compté comme erreur de lecture
+                    failure = repr(exc)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if failure:
+                        errors.append(failure)
+
+    def long_read_loop() -> None:
+        # transaction de lecture explicite : le verrou partagé est tenu jusqu'au rollback
+        while importing.is_set():
+            try:
+                with get_engine().connect() as connection:
+                    connection.exec_driver_sql("BEGIN")
+                    connection.exec_driver_sql("SELECT count(*) FROM establishment").all()
+                    finished.wait(long_read_seconds)
+                    connection.rollback()
+            except OperationalError as exc:
+                with lock:
+                    errors.append(str(exc.orig))
+            time.sleep(0.5)
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    if long_read_seconds:
+        threads.append(threading.Thread(target=long_read_loop))
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    failure = None
+    try:
+        with get_session() as session:
+            try:
+                asyncio.run(SireneImporter().import_for_site(session, session.get(ImportJob, job_id)))
+            except Exception as exc:  # un verrou peut aussi faire échouer l'enregistrement de l'échec
+                failure = str(exc)
+        import_seconds = time.perf_counter() - start
+    finally:
+        importing.clear()
+        finished.set()
+        for thread in threads:
+            thread.join()
+    try:
+        with get_session() as session:
+            job = session.get(ImportJob, job_id)
+            status, last_error, rows = job.status, job.last_error or failure, job.rows_processed
+    except OperationalError as exc:
+        # la base peut rester verrouillée après un import interrompu par un verrou
+        status, last_error, rows = "failed", failure or str(exc.orig), 0
+
+    return {
+        "import_status": status,
+        "import_error": last_error,
+        "import_seconds": import_seconds,
+        "import_rows_per_second": rows / import_seconds,
+        "reads": len(latencies),
+        "read_ms_p50": percentile(latencies, 50) * 1000 if latencies else 0.0,
+        "read_ms_p99": percentile(latencies, 99) * 1000 if latencies else 0.0,
+        "read_ms_max": max(latencies, default=0.0) * 1000,
+        "read_errors": len(errors),
+        "locked_errors": sum("locked" in error for error in errors) + ("locked" in (last_error or "")),
+    }
+
+
+def run_profiles(
+    rows: int,
+    readers: int,
+    profiles: list[str],
+    page_size: int = 1000,
+    long_read_seconds: float = LONG_READ_SECONDS,
+    database_url: str | None = None,
+    report: Callable[[str], None] = print,
+) -> dict[str, dict[str, Any]]:
+    """Exécute le scénario pour chaque profil, chacun dans un processus et sur une base neuve."""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, serve(create_sirene_app(rows)) as sirene_url:
+        for profile in profiles:
+            report(f"import de {rows} lignes avec {readers} lecteurs, profil {profile}…")
+            env = {
+                **os.environ,
+                "GENERATEUR_DATABASE_URL": database_url or f"sqlite:///{workdir}/{profile}.db",
+                "GENERATEUR_DATABASE_TUNING": PROFILES[profile],
+                "GENERATEUR_SIRENE_BASE_URL": sirene_url,
+                "GENERATEUR_SIRENE_API_KEY": "benchmark",
+                "GENERATEUR_SIRENE_RATE_LIMIT_PER_MINUTE": "1000000",
+                "GENERATEUR_SIRENE_DEFAULT_PAGE_SIZE": str(page_size),
+            }
+            worker = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.concurrency",
+                    "--worker",
+                    "--readers",
+                    str(readers),
+                    "--long-read-seconds",
+                    str(long_read_seconds),
+                ],
+                cwd=BACKEND_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if worker.returncode:
+                raise RuntimeError(f"le profil {profile} a échoué :\n{worker.stderr}")
+            results[profile] = json.loads(worker.stdout.splitlines()[-1])
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument(
+        "--long-read-seconds",
+        type=float,
+        default=LONG_READ_SECONDS,
+        help="Durée de la transaction de lecture longue (0 pour la désactiver).",
+    )
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--database-url", help="Base à utiliser (par défaut une base SQLite temporaire par profil).")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.readers, args.long_read_seconds)))
+        return
+
+    try:
+        results = run_profiles(
+            args.rows,
+            args.readers,
+            args.profiles,
+            page_size=args.page_size,
+            long_read_seconds=args.long_read_seconds,
+            database_url=args.database_url,
+            report=lambda message: print(message, flush=True),
+        )
+    except RuntimeError as exc:
+        raise SystemExit(str(exc)) from exc
+
+    print(f"\n{'mesure':<26}" + "".join(f"{profile:>14}" for profile in results))
+    for name in next(iter(results.values())):
+        values = [result[name] for result in results.values()]
+        cells = "".join(f"{value:>14.1f}" if isinstance(value, float) else f"{str(value)[:13]:>14}" for value in values)
+        print(f"{name:<26}{cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Benchmark de bout en bout : import SIRENE, géocodage BAN, génération OpenAI et API de liste.
+
+Les services externes sont remplacés par les serveurs locaux de :mod:`benchmarks.fakes`. Chaque
+exécution est ajoutée à ``benchmarks/results.jsonl`` et comparée à la précédente de même configuration.
+
+Usage depuis le dossier ``backend`` ::
+
+    python -m benchmarks.e2e --import-rows 20000 --api-sizes 10000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import event, func, insert, literal, select
+
+from .fakes import create_ban_app, create_openai_app, create_sirene_app, serve, synthetic_establishment
+
+RESULTS_PATH = Path(__file__).with_name("results.jsonl")
+
+
+def percentile(values: list[float], rank: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(rank / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _configure_environment(database_url: str, sirene_url: str, ban_url: str, openai_url: str, page_size: int) -> None:
+    # doit précéder tout import de ``app`` : le moteur est créé à partir de la configuration
+    os.environ.update(
+        {
+            "GENERATEUR_DATABASE_URL": database_url,
+            "GENERATEUR_SIRENE_BASE_URL": sirene_url,
+            "GENERATEUR_SIRENE_API_KEY": "benchmark",
+            "GENERATEUR_SIRENE_RATE_LIMIT_PER_MINUTE": "1000000",
+            "GENERATEUR_SIRENE_DEFAULT_PAGE_SIZE": str(page_size),
+            "GENERATEUR_BAN_BASE_URL": ban_url,
+            "GENERATEUR_OPENAI_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": f"{openai_url}/v1",
+        }
+    )
+
+
+def bench_import(rows: int) -> dict[str, Any]:
+    from sqlmodel import Session
+
+    from app.database import get_session
+    from app.models import ImportJob, Site
+    from app.services.sirene import SireneImporter
+
+    commits: list[float] = []
+    started: dict[int, float] = {}
+
+    def before_commit(session: Session) -> None:
+        started[id(session)] = time.perf_counter()
+
+    def after_commit(session: Session) -> None:
+        if (start := started.pop(id(session), None)) is not None:
+            commits.append(time.perf_counter() - start)
+
+    with get_session() as session:
+        site = Site(name="Import", slug=f"import-{time.time_ns()}")
+        session.add(site)
+        session.commit()
+        session.refresh(site)
+        site_id = site.id
+        job = ImportJob(site_id=site_id)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+        event.listen(Session, "before_commit", before_commit)
+        event.listen(Session, "after_commit", after_commit)
+        try:
+            start = time.perf_counter()
+            asyncio.run(SireneImporter().import_for_site(session, job))
+            elapsed = time.perf_counter() - start
+        finally:
+            event.remove(Session, "before_commit", before_commit)
+            event.remove(Session, "after_commit", after_commit)
+        assert job.total_imported == rows, (job.total_imported, rows)
+
+    return {
+        "site_id": site_id,
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed,
+        "commits": len(commits),
+        "commit_seconds_total": sum(commits),
+        "commit_ms_p50": percentile(commits, 50) * 1000,
+        "commit_ms_p99": percentile(commits, 99) * 1000,
+    }
+
+
+def bench_geocoding(site_id: int, rows: int) -> dict[str, Any]:
+    from app.database import get_session
+    from app.models import Establishment, SiteEstablishment
+    from app.services.geocoding import GeocodingService
+
+    async def run() -> int:
+        service = GeocodingService()
+        try:
+            with get_session() as session:
+                return await service.geocode_site(session, site_id, limit=rows)
+        finally:
+            await service.close()
+
+    start = time.perf_counter()
+    processed = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    with get_session() as session:
+        located = session.exec(
+            select(func.count())
+            .select_from(Establishment)
+            .join(SiteEstablishment, SiteEstablishment.establishment_id == Establishment.id)
+            .where(SiteEstablishment.site_id == site_id, Establishment.geo_lat.is_not(None))
+        ).one()[0]
+    return {
+        "rows": processed,
+        "seconds": elapsed,
+        "geocodes_per_second": processed / elapsed if elapsed else 0.0,
+        "hit_rate": located / processed if processed else 0.0,
+    }
+
+
+def bench_generation(requests: int) -> dict[str, Any]:
+    from app.database import get_session
+    from app.models import PromptTemplate, Site
+    from app.services.generation import ContentGenerationService
+
+    with get_session() as session:
+        site = Site(name="Generation", slug=f"generation-{time.time_ns()}")
+        session.add(site)
+        session.commit()
+        session.refresh(site)
+        template = PromptTemplate(site_id=site.id, label="Ville", prompt="Rédige une introduction pour {metier} à {city}.")
+        session.add(template)
+        session.commit()
+        session.refresh(template)
+
+        async def run() -> list[float]:
+            service = ContentGenerationService()
+            latencies = []
+            for index in range(requests):
+                start = time.perf_counter()
+                await service.generate_content(template.id, {"metier": "plombier", "city": f"Lyon {index}"}, session)
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        latencies = asyncio.run(run())
+    return {
+        "requests": requests,
+        "latency_ms_p50": percentile(latencies, 50) * 1000,
+        "latency_ms_p99": percentile(latencies, 99) * 1000,
+    }
+
+
+def _populate_site(rows: int, batch_size: int = 20_000) -> int:
+    from app.database import get_engine, get_session
+    from app.models import Establishment, Site, SiteEstablishment
+
+    with get_session() as session:
+        site = Site(name=f"API {rows}", slug=f"api-{rows}-{time.time_ns()}")
+        session.add(site)
+        session.commit()
+        session.refresh(site)
+        site_id = site.id
+
+    now = datetime.utcnow()
+    offset = 10**8 * (site_id + 1)  # SIRET uniques entre les sites de benchmark
+    table = Establishment.__table__
+    with get_engine().begin() as connection:
+        last_id = connection.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar_one()
+        for start in range(0, rows, batch_size):
+            batch = []
+            for index in range(start, min(start + batch_size, rows)):
+                payload = synthetic_establishment(offset + index)
+                period = payload["periodesEtablissement"][0]
+                batch.append(
+                    {
+                        "siren": payload["siren"],
+                        "nic": payload["nic"],
+                        "siret": payload["siret"],
+                        "business_name": payload["uniteLegale"]["denominationUniteLegale"],
+                        "naf_code": payload["activitePrincipaleEtablissement"],
+                        "address": f"{period['numeroVoieEtablissement']} {period['libelleVoieEtablissement']}",
+                        "postal_code": period["codePostalEtablissement"],
+                        "city": period["libelleCommuneEtablissement"],
+                        "department": period["codeDepartementEtablissement"],
+                        "is_active": payload["etatAdministratifEtablissement"] == "A",
+                        "imported_at": now,
+                        "last_seen_at": now,
+                        "geo_lat": 45.75,
+                        "geo_lon": 4.85,
+                        "geo_status": "0.91",
+                    }
+                )
+            connection.execute(insert(table), batch)
+        connection.execute(
+            insert(SiteEstablishment.__table__).from_select(
+                ["site_id", "establishment_id", "created_at"],
+                select(literal(site_id), table.c.id, literal(now)).where(table.c.id > last_id),
+            )
+        )
+    return site_id
+
+
+def bench_list_api(rows: int, requests: int) -> dict[str, Any]:
+    from fastapi.testclient import TestClient
+
+    from app.cache import response_cache
+    from app.main import app
+
+    site_id = _populate_site(rows)
+    client = TestClient(app)
+    url = f"/sites/{site_id}/establishments/"
+
+    cold: list[float] = []
+    for _ in range(requests):
+        response_cache.clear()
+        start = time.perf_counter()
+        response = client.get(url)
+        cold.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+    warm: list[float] = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get(url).raise_for_status()
+        warm.append(time.perf_counter() - start)
+
+    etag = response.headers.get("etag")
+    revalidated: list[float] = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get(url, headers={"If-None-Match": etag} if etag else {})
+        revalidated.append(time.perf_counter() - start)
+
+    return {
+        "rows": rows,
+        "requests": requests,
+        "response_bytes": len(response.content),
+        "uncached_ms_p50": percentile(cold, 50) * 1000,
+        "uncached_ms_p99": percentile(cold, 99) * 1000,
+        "cached_ms_p50": percentile(warm, 50) * 1000,
+        "cached_ms_p99": percentile(warm, 99) * 1000,
+        "not_modified_ms_p50": percentile(revalidated, 50) * 1000,
+        "not_modified_ms_p99": percentile(revalidated, 99) * 1000,
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten_metrics(results: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten_metrics(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = float(value)
+    return flat
+
+
+def report(entry: dict[str, Any], results_path: Path) -> None:
+    previous = None
+    if results_path.exists():
+        for line in results_path.read_text(encoding="utf-8").splitlines():
+            candidate = json.loads(line)
+            if candidate.get("config") == entry["config"]:
+                previous = candidate
+    with results_path.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    current = _flatten_metrics(entry["results"])
+    baseline = _flatten_metrics(previous["results"]) if previous else {}
+    print(f"{'mesure':<48} {'valeur':>12} {'précédent':>12} {'écart':>8}")
+    for name, value in current.items():
+        before = baseline.get(name)
+        delta = f"{(value - before) / before * 100:+.1f}%" if before else ""
+        before_text = f"{before:.2f}" if before is not None else "-"
+        print(f"{name:<48} {value:>12.2f} {before_text:>12} {delta:>8}")
+    if previous:
+        print(f"\ncomparé à {previous.get('revision') or '?'} du {previous['timestamp']}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout avec services SIRENE, BAN et OpenAI simulés.")
+    parser.add_argument("--import-rows", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--sirene-latency", type=float, default=0.0, help="Latence simulée par page (s).")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Renvoie un 429 toutes les N requêtes.")
+    parser.add_argument("--geocode-rows", type=int, default=2000)
+    parser.add_argument("--ban-latency", type=float, default=0.0)
+    parser.add_argument("--ban-miss-every", type=int, default=20)
+    parser.add_argument("--openai-requests", type=int, default=50)
+    parser.add_argument("--openai-latency", type=float, default=0.0)
+    parser.add_argument("--api-sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--api-requests", type=int, default=20)
+    parser.add_argument("--database-url", help="Base à utiliser (par défaut une base SQLite temporaire).")
+    parser.add_argument("--results", type=Path, default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("database_url", "results")}
+    config["database"] = (args.database_url or "sqlite").split(":", 1)[0]
+
+    with tempfile.TemporaryDirectory() as workdir, ExitStack() as stack:
+        sirene = create_sirene_app(args.import_rows, latency=args.sirene_latency, rate_limit_every=args.rate_limit_every)
+        sirene_url = stack.enter_context(serve(sirene))
+        ban_url = stack.enter_context(serve(create_ban_app(latency=args.ban_latency, miss_every=args.ban_miss_every)))
+        openai_url = stack.enter_context(serve(create_openai_app(latency=args.openai_latency)))
+        _configure_environment(
+            args.database_url or f"sqlite:///{workdir}/benchmark.db", sirene_url, ban_url, openai_url, args.page_size
+        )
+
+        from app import models  # noqa: F401 - enregistre les tables avant create_all
+        from app.database import init_db
+
+        init_db()
+        results: dict[str, Any] = {}
+        print("import SIRENE…")
+        results["import"] = bench_import(args.import_rows)
+        results["import"]["sirene_requests"] = sirene.state.requests
+        results["import"]["sirene_throttled"] = sirene.state.throttled
+        print("géocodage BAN…")
+        results["geocoding"] = bench_geocoding(results["import"].pop("site_id"), args.geocode_rows)
+        print("génération OpenAI…")
+        results["generation"] = bench_generation(args.openai_requests)
+        for size in args.api_sizes:
+            print(f"list_establishments ({size} lignes)…")
+            results[f"list_establishments_{size}"] = bench_list_api(size, args.api_requests)
+
+    entry = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "config": config,
+        "results": results,
+    }
+    report(entry, args.results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Serveurs locaux imitant SIRENE, la BAN et OpenAI pour les benchmarks de bout en bout."""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import uvicorn
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+STREETS = ["RUE DE LA REPUBLIQUE", "AVENUE JEAN JAURES", "BOULEVARD DES BELGES", "PLACE BELLECOUR"]
+CITIES = [("69381", "LYON 1ER", "69001"), ("69383", "LYON 3E", "69003"), ("69123", "LYON", "69002")]
+
+
+def _period(index: int, start_year: int) -> dict:
+    insee_code, city, postal_code = CITIES[index % len(CITIES)]
+    return {
+        "dateDebut": f"{start_year}-03-01",
+        "numeroVoieEtablissement": str(index % 150 + 1),
+        "typeVoieEtablissement": None,
+        "libelleVoieEtablissement": STREETS[index % len(STREETS)],
+        "codePostalEtablissement": postal_code,
+        "libelleCommuneEtablissement": city,
+        "codeCommuneEtablissement": insee_code,
+        "codeDepartementEtablissement": "69",
+    }
+
+
+def synthetic_establishment(index: int, closed_every: int = 11, periods: int = 1) -> dict:
+    """Établissement fictif ; ``periods`` allonge l'historique ``periodesEtablissement``."""
+    siren = f"{index:09d}"
+    nic = f"{index % 100000:05d}"
+    return {
+        "siren": siren,
+        "nic": nic,
+        "siret": f"{siren}{nic}",
+        "etatAdministratifEtablissement": "F" if index % closed_every == 0 else "A",
+        "trancheEffectifsEtablissement": "02",
+        "dateCreationEtablissement": "2015-03-01",
+        "activitePrincipaleEtablissement": "43.22A",
+        "nomenclatureActivitePrincipaleEtablissement": "NAFRev2",
+        "uniteLegale": {"denominationUniteLegale": f"PLOMBERIE {index}"},
+        "periodesEtablissement": [_period(index + offset, 2015 - periods + 1 + offset) for offset in range(periods)],
+    }
+
+
+def create_sirene_app(
+    total: int,
+    latency: float = 0.0,
+    rate_limit_every: int = 0,
+    periods: int = 1,
+) -> FastAPI:
+    """Pagination par curseur sur ``total`` établissements ; une réponse 429 toutes les ``rate_limit_every`` requêtes."""
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.throttled = 0
+
+    @app.get("/etablissements")
+    async def etablissements(
+        nombre: int = Query(default=1000),
+        curseur: str = Query(default="*"),
+    ) -> Response:
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if rate_limit_every and app.state.requests % rate_limit_every == 0:
+            app.state.throttled += 1
+            return JSONResponse({"fault": {"message": "Too Many Requests"}}, status_code=429)
+        offset = 0 if curseur == "*" else int(curseur)
+        end = min(offset + nombre, total)
+        next_cursor = str(end) if end < total else curseur
+        return JSONResponse(
+            {
+                "header": {"statut": 200, "total": total, "debut": offset, "nombre": end - offset,
+                           "curseur": curseur, "curseurSuivant": next_cursor},
+                "etablissements": [
+                    synthetic_establishment(index, periods=periods) for index in range(offset, end)
+                ],
+                "curseurSuivant": next_cursor,
+            }
+        )
+
+    return app
+
+
+def _feature(query: str, score: float) -> dict:
+    seed = sum(map(ord, query))
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [4.80 + (seed % 1000) * 1e-4, 45.70 + (seed % 997) * 1e-4]},
+        "properties": {"label": query, "score": score},
+    }
+
+
+def create_ban_app(latency: float = 0.0, miss_every: int = 0) -> FastAPI:
+    """API BAN : ``/search/`` et ``/search/csv/`` ; une adresse sur ``miss_every`` reste introuvable."""
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.get("/search/")
+    async def search(q: str, limit: int = 1) -> dict:
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if miss_every and app.state.requests % miss_every == 0:
+            return {"type": "FeatureCollection", "features": []}
+        return {"type": "FeatureCollection", "features": [_feature(q, 0.91)][:limit]}
+
+    @app.post("/search/csv/")
+    async def search_csv(request: Request) -> PlainTextResponse:
+        form = await request.form()
+        upload = form["data"]
+        content = (await upload.read()).decode("utf-8")  # type: ignore[union-attr]
+        reader = csv.DictReader(io.StringIO(content))
+        output = io.StringIO()
+        fieldnames = list(reader.fieldnames or []) + ["latitude", "longitude", "result_score"]
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer.writeheader()
+        for position, row in enumerate(reader, start=1):
+            app.state.requests += 1
+            if miss_every and position % miss_every == 0:
+                writer.writerow({**row, "latitude": "", "longitude": "", "result_score": ""})
+                continue
+            longitude, latitude = _feature(" ".join(row.values()), 0.91)["geometry"]["coordinates"]
+            writer.writerow({**row, "latitude": latitude, "longitude": longitude, "result_score": 0.91})
+        if latency:
+            await asyncio.sleep(latency)
+        return PlainTextResponse(output.getvalue(), media_type="text/csv")
+
+    return app
+
+
+def create_openai_app(latency: float = 0.0) -> FastAPI:
+    """Sous-ensemble de l'API Responses d'OpenAI suffisant pour ``ContentGenerationService``."""
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.post("/v1/responses")
+    async def responses(request: Request) -> dict:
+        app.state.requests += 1
+        payload = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        prompt = str(payload.get("input", ""))
+        text = f"Contenu généré ({len(prompt)} caractères de prompt)."
+        return {
+            "id": f"resp_{app.state.requests}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": payload.get("model", "gpt-4.1-mini"),
+            "status": "completed",
+            "output": [
+                {
+                    "type": "message",
+                    "id": f"msg_{app.state.requests}",
+                    "status": "completed",
+                    "role": "assistant",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }
+            ],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(text) // 4,
+                "total_tokens": (len(prompt) + len(text)) // 4,
+            },
+        }
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(app: FastAPI, port: Optional[int] = None) -> Iterator[str]:
+    """Sert ``app`` avec Uvicorn dans un thread et produit son URL de base."""
+    port = port or _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
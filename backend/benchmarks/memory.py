@@ -0,0 +1,145 @@
+"""Mémoire résidente (RSS) d'un import SIRENE synthétique, en mode standard et en mode mémoire bornée.
+
+Chaque mode est exécuté dans un processus distinct, le faux serveur SIRENE tournant dans le
+processus parent pour ne pas fausser la mesure. La mémoire propre à SQLite (projection du
+fichier et cache de pages, bornés par configuration) est réduite pour ne mesurer que
+l'importeur : en mode borné, le RSS doit rester plat quel que soit le nombre de lignes.
+
+Usage depuis le dossier ``backend`` ::
+
+    python -m benchmarks.memory --rows 1000000 --periods 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+from .fakes import create_sirene_app, serve
+
+MODES = ("standard", "bounded")
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # hors Linux : pic de RSS, en kilo-octets sauf sous macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_worker(rows: int) -> dict[str, Any]:
+    """Importe ``rows`` établissements et relève le RSS après chaque page."""
+    from sqlalchemy import event
+    from sqlmodel import Session
+
+    from app import models  # noqa: F401 - enregistre les tables avant create_all
+    from app.database import get_session, init_db
+    from app.models import ImportJob, Site
+    from app.services.sirene import SireneImporter
+
+    init_db()
+    samples: list[float] = []
+
+    with get_session() as session:
+        site = Site(name="Mémoire", slug="memoire")
+        session.add(site)
+        session.commit()
+        job = ImportJob(site_id=site.id)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+        def after_commit(committed: Session) -> None:
+            # deux commits par page : les établissements puis l'avancement du job
+            if committed is session:
+                samples.append(current_rss_mb())
+
+        baseline = current_rss_mb()
+        event.listen(Session, "after_commit", after_commit)
+        start = time.perf_counter()
+        try:
+            asyncio.run(SireneImporter().import_for_site(session, job))
+        finally:
+            event.remove(Session, "after_commit", after_commit)
+        elapsed = time.perf_counter() - start
+        assert job.status == "completed", job.last_error
+
+    return {"baseline_mb": baseline, "seconds": elapsed, "samples": samples}
+
+
+def summarize(rows: int, result: dict[str, Any]) -> dict[str, float]:
+    samples = result["samples"]
+
+    def at(fraction: float) -> float:
+        return samples[max(0, min(len(samples) - 1, round(fraction * len(samples)) - 1))]
+
+    tenth, last = at(0.1), at(1.0)
+    return {
+        "baseline_mb": result["baseline_mb"],
+        "rss_10pct_mb": tenth,
+        "rss_50pct_mb": at(0.5),
+        "rss_end_mb": last,
+        "peak_mb": max(samples),
+        # croissance entre 10 % et 100 % de l'import, ~0 si la mémoire est bornée
+        "growth_mb_per_100k_rows": (last - tenth) / (0.9 * rows) * 100_000,
+        "rows_per_second": rows / result["seconds"],
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--periods", type=int, default=5, help="Longueur de l'historique periodesEtablissement.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.rows)))
+        return
+
+    summaries = {}
+    with tempfile.TemporaryDirectory() as workdir, serve(
+        create_sirene_app(args.rows, periods=args.periods)
+    ) as sirene_url:
+        for mode in args.modes:
+            print(f"import de {args.rows} lignes en mode {mode}…", flush=True)
+            env = {
+                **os.environ,
+                "GENERATEUR_DATABASE_URL": f"sqlite:///{workdir}/{mode}.db",
+                "GENERATEUR_SIRENE_BASE_URL": sirene_url,
+                "GENERATEUR_SIRENE_API_KEY": "benchmark",
+                "GENERATEUR_SIRENE_RATE_LIMIT_PER_MINUTE": "1000000",
+                "GENERATEUR_SIRENE_DEFAULT_PAGE_SIZE": str(args.page_size),
+                "GENERATEUR_IMPORT_BOUNDED_MEMORY": str(mode == "bounded").lower(),
+                # la projection du fichier grandirait avec la base jusqu'à sqlite_mmap_size
+                "GENERATEUR_SQLITE_MMAP_SIZE": "0",
+                "GENERATEUR_SQLITE_CACHE_SIZE_KB": "8192",
+            }
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.memory", "--worker", "--rows", str(args.rows)],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            summaries[mode] = summarize(args.rows, json.loads(output.splitlines()[-1]))
+
+    print(f"\n{'mesure':<28}" + "".join(f"{mode:>12}" for mode in summaries))
+    for name in next(iter(summaries.values())):
+        print(f"{name:<28}" + "".join(f"{summary[name]:>12.1f}" for summary in summaries.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compare la sérialisation des listes : ORM + validation pydantic + encodeur JSON standard contre projection + orjson.
+
+Usage : ``python -m benchmarks.serialization --rows 10000 --repeat 5`` depuis le dossier ``backend``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models import Establishment, Site, SiteEstablishment
+from app.schemas import EstablishmentRead
+from app.serialization import dump_rows, select_fields
+
+
+def _populate(session: Session, rows: int) -> int:
+    site = Site(name="Benchmark", slug="benchmark")
+    session.add(site)
+    session.commit()
+    session.refresh(site)
+    now = datetime.utcnow()
+    session.bulk_insert_mappings(
+        Establishment,
+        [
+            {
+                "siren": f"{index:09d}",
+                "nic": "00012",
+                "siret": f"{index:09d}00012",
+                "business_name": f"Entreprise {index}",
+                "naf_code": "43.22A",
+                "naf_label": "NAFRev2",
+                "address": f"{index % 200} RUE DE LA REPUBLIQUE",
+                "postal_code": f"69{index % 10:03d}",
+                "city": "LYON",
+                "department": "69",
+                "is_active": index % 7 != 0,
+                "imported_at": now,
+                "last_seen_at": now,
+                "geo_lat": 45.75 + index * 1e-6,
+                "geo_lon": 4.85 + index * 1e-6,
+                "geo_status": "0.91",
+                "extra_metadata": {"trancheEffectifs": "02", "dateCreation": "2015-03-01"},
+            }
+            for index in range(rows)
+        ],
+    )
+    session.bulk_insert_mappings(
+        SiteEstablishment,
+        [{"site_id": site.id, "establishment_id": establishment_id} for establishment_id in range(1, rows + 1)],
+    )
+    session.commit()
+    return site.id
+
+
+def current_path(session: Session, site_id: int) -> bytes:
+    # reproduit FastAPI : objets ORM, validation via response_model, jsonable_encoder puis json.dumps
+    rows = session.exec(
+        select(Establishment, SiteEstablishment.site_id)
+        .join(SiteEstablishment, SiteEstablishment.establishment_id == Establishment.id)
+        .where(SiteEstablishment.site_id == site_id)
+    ).all()
+    adapter = TypeAdapter(list[EstablishmentRead])
+    validated = adapter.validate_python(
+        [{**establishment.model_dump(), "site_id": member_site_id} for establishment, member_site_id in rows]
+    )
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(session: Session, site_id: int) -> bytes:
+    query = (
+        select_fields(EstablishmentRead, Establishment, site_id=SiteEstablishment.site_id)
+        .join(SiteEstablishment, SiteEstablishment.establishment_id == Establishment.id)
+        .where(SiteEstablishment.site_id == site_id)
+    )
+    return dump_rows(EstablishmentRead, session.exec(query))
+
+
+def _measure(engine, site_id: int, func: Callable[[Session, int], bytes], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            func(session, site_id)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(rows: int, repeat: int) -> dict[str, float]:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        site_id = _populate(session, rows)
+        assert json.loads(current_path(session, site_id)) == json.loads(fast_path(session, site_id))
+
+    current = statistics.median(_measure(engine, site_id, current_path, repeat))
+    fast = statistics.median(_measure(engine, site_id, fast_path, repeat))
+    return {"rows": rows, "current_s": current, "fast_s": fast, "speedup": current / fast}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    print(f"{'lignes':>8} {'actuel (s)':>12} {'rapide (s)':>12} {'gain':>6}")
+    for rows in args.rows:
+        result = run(rows, args.repeat)
+        print(f"{rows:>8} {result['current_s']:>12.4f} {result['fast_s']:>12.4f} {result['speedup']:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
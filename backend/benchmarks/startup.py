@@ -0,0 +1,111 @@
+"""Temps de démarrage à froid : import de l'application, ``python -m app.cli`` et ``uvicorn app.main:app``.
+
+Chaque mesure lance un nouvel interpréteur sur une base SQLite neuve. ``--compare REF`` mesure
+aussi une autre révision git (extraite dans un worktree temporaire).
+
+Usage depuis le dossier ``backend`` ::
+
+    python -m benchmarks.startup --repeat 5 --compare HEAD~1
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from .fakes import _free_port
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _environment(database_path: Path) -> dict[str, str]:
+    return {
+        **os.environ,
+        "GENERATEUR_DATABASE_URL": f"sqlite:///{database_path}",
+        "GENERATEUR_SIRENE_API_KEY": "benchmark",
+    }
+
+
+def _timed_run(command: list[str], cwd: Path, env: dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, cwd=cwd, env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def _first_response(cwd: Path, env: dict[str, str], timeout: float = 60.0) -> float:
+    """Délai entre le lancement d'uvicorn et la première réponse HTTP de l'API."""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn s'est arrêté avant de répondre")
+            time.sleep(0.01)
+        raise TimeoutError("uvicorn n'a pas répondu à temps")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def measure(cwd: Path, repeat: int) -> dict[str, float]:
+    timings: dict[str, list[float]] = {"import_app_main": [], "cli_help": [], "uvicorn_first_response": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        # premier lancement écarté : il compile le bytecode d'un worktree neuf
+        _timed_run([sys.executable, "-c", "import app.main"], cwd, _environment(Path(workdir) / "warmup.db"))
+        for index in range(repeat):
+            env = _environment(Path(workdir) / f"startup-{index}.db")
+            timings["import_app_main"].append(_timed_run([sys.executable, "-c", "import app.main"], cwd, env))
+            timings["cli_help"].append(_timed_run([sys.executable, "-m", "app.cli", "--help"], cwd, env))
+            timings["uvicorn_first_response"].append(_first_response(cwd, env))
+    return {name: statistics.median(values) for name, values in timings.items()}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--compare", metavar="REF", help="Révision git à mesurer en référence (ex: HEAD~1).")
+    args = parser.parse_args(argv)
+
+    results = {"actuel": measure(BACKEND_DIR, args.repeat)}
+    if args.compare:
+        repository = BACKEND_DIR.parent
+        with tempfile.TemporaryDirectory() as workdir:
+            worktree = Path(workdir) / "reference"
+            subprocess.run(
+                ["git", "worktree", "add", "--detach", str(worktree), args.compare],
+                cwd=repository,
+                check=True,
+                capture_output=True,
+            )
+            try:
+                results[args.compare] = measure(worktree / BACKEND_DIR.name, args.repeat)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=repository, check=True)
+
+    print(f"{'mesure (médiane, s)':<26}" + "".join(f"{label:>12}" for label in results))
+    for name in results["actuel"]:
+        print(f"{name:<26}" + "".join(f"{result[name]:>12.3f}" for result in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare le rendu des prompts en lot : ``str.format`` à chaque ligne contre template compilé.
+
+Usage : ``python -m benchmarks.templates --rows 100000 --repeat 5`` depuis le dossier ``backend``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Any, Callable
+
+from app.services.templates import compile_template
+
+PROMPT = (
+    "Rédige une introduction de 150 mots pour l'annuaire {site} à {ville} ({departement}). "
+    "Mentionne les {nombre_etablissements} professionnels référencés et les codes postaux {codes_postaux}. "
+    "Ton chaleureux, 100 % factuel, sans superlatifs."
+)
+
+
+def _rows(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "site": "Plombiers de France",
+            "ville": f"Commune {index}",
+            "departement": f"{index % 95 + 1:02d}",
+            "codes_postaux": f"{index % 95 + 1:02d}{index % 1000:03d}",
+            "nombre_etablissements": index % 300,
+        }
+        for index in range(count)
+    ]
+
+
+def current_path(rows: list[dict[str, Any]]) -> list[str]:
+    return [PROMPT.format(**variables) for variables in rows]
+
+
+def compiled_path(rows: list[dict[str, Any]]) -> list[str]:
+    return list(compile_template(PROMPT).render_many(rows))
+
+
+def _measure(func: Callable[[list[dict[str, Any]]], list[str]], rows: list[dict[str, Any]], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    print(f"{'lignes':>8} {'format (s)':>12} {'compilé (s)':>12} {'gain':>6}")
+    for count in args.rows:
+        rows = _rows(count)
+        assert current_path(rows) == compiled_path(rows)
+        current = _measure(current_path, rows, args.repeat)
+        compiled = _measure(compiled_path, rows, args.repeat)
+        print(f"{count:>8} {current:>12.4f} {compiled:>12.4f} {current / compiled:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
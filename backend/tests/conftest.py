@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+# base et référentiel isolés, fixés avant le premier import de l'application
+_WORKDIR = tempfile.mkdtemp(prefix="generateur-tests-")
+os.environ.setdefault("GENERATEUR_DATABASE_URL", f"sqlite:///{_WORKDIR}/tests.db")
+os.environ.setdefault("GENERATEUR_COMMUNE_REFERENTIAL_PATH", f"{_WORKDIR}/communes.bin")
+
+
+@pytest.fixture
+def session():
+    from app import models  # noqa: F401 - enregistre les tables
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, select
+
+from app.models import (
+    ArchivedEstablishment,
+    ArchivedSiteEstablishment,
+    Establishment,
+    Site,
+    SiteEstablishment,
+)
+from app.services.archive import archive_closed_establishments, delete_site_establishments
+
+
+def _establishment(index: int, **values) -> Establishment:
+    return Establishment(siren=f"{index:09d}", nic="00012", siret=f"{index:09d}00012", **values)
+
+
+def test_delete_site_establishments_keeps_shared_ones(session: Session):
+    kept, deleted = Site(name="Gardé", slug="garde"), Site(name="Supprimé", slug="supprime")
+    session.add_all([kept, deleted])
+    session.commit()
+    shared, own, own_closed = (
+        _establishment(1),
+        _establishment(2),
+        _establishment(3, is_active=False, closed_at=datetime.utcnow() - timedelta(days=800)),
+    )
+    session.add_all([shared, own, own_closed])
+    session.commit()
+    session.add_all(
+        [
+            SiteEstablishment(site_id=kept.id, establishment_id=shared.id),
+            SiteEstablishment(site_id=deleted.id, establishment_id=shared.id),
+            SiteEstablishment(site_id=deleted.id, establishment_id=own.id),
+            SiteEstablishment(site_id=deleted.id, establishment_id=own_closed.id),
+        ]
+    )
+    session.commit()
+    assert archive_closed_establishments(session, timedelta(days=365)) == 1
+
+    assert delete_site_establishments(session, deleted.id, batch_size=1) == 2
+    session.commit()
+
+    assert session.exec(select(Establishment.siret)).all() == [shared.siret]
+    assert session.exec(select(SiteEstablishment.site_id)).all() == [kept.id]
+    assert session.exec(select(ArchivedEstablishment)).all() == []
+    assert session.exec(select(ArchivedSiteEstablishment)).all() == []
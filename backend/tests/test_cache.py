@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from app.cache import ResponseCache, _etag_matches
+
+
+def test_new_version_replaces_the_previous_one():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("/sites/1/establishments", 'W/"v1"', b"a" * 10)
+    cache.put("/sites/1/establishments", 'W/"v2"', b"b" * 20)
+    assert cache.get("/sites/1/establishments", 'W/"v1"') is None
+    assert cache.get("/sites/1/establishments", 'W/"v2"') == b"b" * 20
+    assert cache.size == 20
+
+
+def test_size_is_bounded_in_bytes_with_lru_eviction():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("/a", "1", b"a" * 40)
+    cache.put("/b", "1", b"b" * 40)
+    assert cache.get("/a", "1") is not None
+    cache.put("/c", "1", b"c" * 40)
+    assert cache.get("/b", "1") is None
+    assert cache.get("/a", "1") is not None
+    assert cache.size == 80
+
+
+def test_oversized_bodies_are_not_kept():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("/a", "1", b"a" * 50)
+    cache.put("/a", "2", b"a" * 200)
+    assert cache.get("/a", "1") is None
+    assert cache.get("/a", "2") is None
+    assert cache.size == 0
+
+
+def test_etag_matches():
+    assert _etag_matches('W/"sites-1", W/"sites-2"', 'W/"sites-2"')
+    assert _etag_matches('"sites-2"', 'W/"sites-2"')
+    assert _etag_matches("*", 'W/"sites-2"')
+    assert not _etag_matches(None, 'W/"sites-2"')
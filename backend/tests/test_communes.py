@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.services.communes import CommuneReferential, build_commune_referential, normalize_name
+
+COMMUNES = [
+    {
+        "code": "75101",
+        "nom": "Paris 1er Arrondissement",
+        "codeDepartement": "75",
+        "codesPostaux": ["75001"],
+        "centre": {"type": "Point", "coordinates": [2.33648, 48.86256]},
+    },
+    {
+        "code": "2A004",
+        "nom": "Ajaccio",
+        "codeDepartement": "2A",
+        "codesPostaux": ["20000", "20090"],
+        "centre": {"type": "Point", "coordinates": [8.70069, 41.91886]},
+    },
+    {
+        "code": "01001",
+        "nom": "L'Abergement-Clémenciat",
+        "codeDepartement": "01",
+        "codesPostaux": ["01400"],
+        "centre": {"type": "Point", "coordinates": [4.9306, 46.1517]},
+    },
+    {
+        "code": "01165",
+        "nom": "Dompierre-sur-Chalaronne",
+        "codeDepartement": "01",
+        "codesPostaux": ["01400"],
+        "centre": {"type": "Point", "coordinates": [4.9019, 46.1425]},
+    },
+    {
+        "code": "97411",
+        "nom": "Saint-Denis",
+        "codesPostaux": ["97400"],
+        "centre": {"type": "Point", "coordinates": [55.4481, -20.8907]},
+    },
+]
+
+
+@pytest.fixture
+def referential(tmp_path: Path):
+    path = tmp_path / "communes.bin"
+    assert build_commune_referential(COMMUNES, path) == len(COMMUNES)
+    referential = CommuneReferential(path)
+    yield referential
+    referential.close()
+
+
+def test_lookup_by_commune_code(referential: CommuneReferential):
+    commune = referential.get("75101")
+    assert commune is not None
+    assert (commune.name, commune.department, commune.postal_codes) == ("Paris 1er Arrondissement", "75", ["75001"])
+    assert (commune.lat, commune.lon) == (48.86256, 2.33648)
+    assert referential.get("75102") is None
+    assert referential.get("7510") is None
+
+
+def test_corsican_codes_do_not_collide(referential: CommuneReferential):
+    assert referential.get("2A004").department == "2A"
+    assert referential.get("2a004").code == "2A004"
+    assert referential.get("20004") is None
+
+
+def test_overseas_department_is_derived_from_code(referential: CommuneReferential):
+    assert referential.get("97411").department == "974"
+
+
+def test_lookup_by_postal_code(referential: CommuneReferential):
+    assert [commune.code for commune in referential.by_postal_code("20090")] == ["2A004"]
+    assert sorted(commune.code for commune in referential.by_postal_code("01400")) == ["01001", "01165"]
+    assert referential.by_postal_code("99999") == []
+
+
+def test_resolve(referential: CommuneReferential):
+    assert referential.resolve(commune_code="75101").code == "75101"
+    assert referential.resolve(postal_code="20000").code == "2A004"
+    # code postal partagé : le nom départage les communes, sans tenir compte des accents
+    assert referential.resolve(postal_code="01400", city="L ABERGEMENT CLEMENCIAT").code == "01001"
+    assert referential.resolve(postal_code="01400") is None
+
+
+def test_rejects_foreign_files(tmp_path: Path):
+    path = tmp_path / "autre.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        CommuneReferential(path)
+
+
+def test_normalize_name():
+    assert normalize_name("L'Abergement-Clémenciat") == "L ABERGEMENT CLEMENCIAT"
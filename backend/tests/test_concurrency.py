@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from benchmarks.concurrency import run_profiles
+
+
+def test_reads_during_import_never_hit_database_locks():
+    results = run_profiles(rows=6000, readers=4, profiles=["tuned", "bare"], page_size=500, report=lambda _: None)
+
+    tuned, bare = results["tuned"], results["bare"]
+    # sans WAL, la lecture longue bloque les commits : le scénario provoque bien la contention
+    assert bare["locked_errors"] > 0
+    assert tuned["import_status"] == "completed", tuned["import_error"]
+    assert tuned["reads"] > 0
+    assert tuned["locked_errors"] == 0
+    assert tuned["read_errors"] == 0
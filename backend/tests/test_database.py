@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import SQLModel, create_engine
+
+from app import models  # noqa: F401 - enregistre les tables
+from app.database import _add_missing_columns, _migrate_establishment_sites
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _recreate(engine, table: str, definition: str) -> None:
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE {table}"))
+        connection.execute(text(f"CREATE TABLE {table} ({definition})"))
+
+
+def test_missing_columns_are_added_and_backfilled(engine):
+    # table site telle que créée avant l'ajout de data_version
+    _recreate(
+        engine,
+        "site",
+        "id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, slug VARCHAR NOT NULL, description VARCHAR, "
+        "sirene_filters JSON, openai_prompt VARCHAR, created_at DATETIME NOT NULL",
+    )
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO site (name, slug, created_at) VALUES ('a', 'a', '2024-01-01')"))
+
+    assert _add_missing_columns(engine) == ["site.data_version"]
+    assert _add_missing_columns(engine) == []
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT data_version FROM site")).scalar_one() == 0
+
+
+
+def test_prompt_variables_are_read_from_existing_prompts(engine):
+    # table prompttemplate créée avant l'enregistrement des variables
+    _recreate(
+        engine,
+        "prompttemplate",
+        "id INTEGER PRIMARY KEY, site_id INTEGER NOT NULL, label VARCHAR NOT NULL, prompt VARCHAR NOT NULL, "
+        "scope VARCHAR NOT NULL, created_at DATETIME NOT NULL",
+    )
+    with engine.begin() as connection:
+        for prompt in ("Artisans de {ville} ({departement}) : {nombre_etablissements:>3}", "Texte {0} invalide"):
+            connection.execute(
+                text(
+                    "INSERT INTO prompttemplate (site_id, label, prompt, scope, created_at) "
+                    "VALUES (1, 'p', :prompt, 'city', '2024-01-01')"
+                ),
+                {"prompt": prompt},
+            )
+
+    assert _add_missing_columns(engine) == ["prompttemplate.variables"]
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT variables FROM prompttemplate ORDER BY id")).scalars().all()
+    assert [json.loads(row) for row in rows] == [["ville", "departement", "nombre_etablissements"], []]
+
+def test_required_columns_without_default_are_reported(engine):
+    _recreate(
+        engine,
+        "manualpage",
+        "id INTEGER PRIMARY KEY, title VARCHAR, slug VARCHAR, content VARCHAR, "
+        "seo_description VARCHAR, created_at DATETIME, updated_at DATETIME",
+    )
+    with pytest.raises(RuntimeError, match="manualpage.site_id"):
+        _add_missing_columns(engine)
+
+
+def test_single_site_establishments_are_linked_and_table_rebuilt(engine):
+    # table establishment d'origine : un seul site par établissement, sans AUTOINCREMENT
+    _recreate(
+        engine,
+        "establishment",
+        "id INTEGER PRIMARY KEY, site_id INTEGER NOT NULL, siren VARCHAR NOT NULL, nic VARCHAR NOT NULL, "
+        "siret VARCHAR NOT NULL, business_name VARCHAR, naf_code VARCHAR, naf_label VARCHAR, address VARCHAR, "
+        "postal_code VARCHAR, city VARCHAR, department VARCHAR, is_active BOOLEAN NOT NULL, "
+        "closure_label VARCHAR, closed_at DATETIME, imported_at DATETIME NOT NULL, last_seen_at DATETIME NOT NULL, "
+        "geo_lat FLOAT, geo_lon FLOAT, geo_status VARCHAR, extra_metadata JSON",
+    )
+    with engine.begin() as connection:
+        connection.execute(text("CREATE INDEX ix_establishment_site_id ON establishment (site_id)"))
+        for site_id, index in ((1, 1), (1, 2), (2, 7)):
+            connection.execute(
+                text(
+                    "INSERT INTO establishment (id, site_id, siren, nic, siret, is_active, imported_at, last_seen_at) "
+                    "VALUES (:id, :site_id, 'x', 'y', :siret, 1, '2024-01-01', '2024-01-01')"
+                ),
+                {"id": index, "site_id": site_id, "siret": f"siret-{index}"},
+            )
+
+    assert _migrate_establishment_sites(engine) == [
+        "Rattachements repris de establishment.site_id : 3",
+        "Table reconstruite : establishment (AUTOINCREMENT, sans site_id)",
+    ]
+    assert _migrate_establishment_sites(engine) == []
+    with engine.begin() as connection:
+        links = connection.execute(text("SELECT site_id, establishment_id FROM siteestablishment ORDER BY 2")).all()
+        assert [tuple(link) for link in links] == [(1, 1), (1, 2), (2, 7)]
+        columns = {row[1] for row in connection.execute(text("PRAGMA table_info(establishment)"))}
+        assert "site_id" not in columns
+        # identifiant libéré non réutilisé : il peut appartenir à un établissement archivé
+        connection.execute(text("DELETE FROM establishment WHERE id = 7"))
+        connection.execute(
+            text(
+                "INSERT INTO establishment (siren, nic, siret, is_active, imported_at, last_seen_at) "
+                "VALUES ('x', 'y', 'siret-8', 1, '2024-01-01', '2024-01-01')"
+            )
+        )
+        assert connection.execute(text("SELECT max(id) FROM establishment")).scalar_one() == 8
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from app.models import Establishment, Site, SiteEstablishment
+from app.services.export import EstablishmentExporter
+
+CLOSED_AT = datetime(2024, 3, 1, 8, 30)
+
+
+@pytest.fixture
+def site_id(session) -> int:
+    site = Site(name="Plombiers", slug="plombiers")
+    session.add(site)
+    session.commit()
+    establishments = [
+        Establishment(siren="000000001", nic="00012", siret="00000000100012", extra_metadata={"dateCreation": "2015"}),
+        Establishment(
+            siren="000000002", nic="00012", siret="00000000200012", is_active=False, closed_at=CLOSED_AT
+        ),
+    ]
+    session.add_all(establishments)
+    session.commit()
+    session.add_all([SiteEstablishment(site_id=site.id, establishment_id=item.id) for item in establishments])
+    session.commit()
+    return site.id
+
+
+def test_csv_export_includes_closing_date(session, site_id: int):
+    exporter = EstablishmentExporter(session, site_id)
+    header, first, second = "".join(exporter.iter_csv()).splitlines()
+    columns = header.split(",")
+    assert "closed_at" in columns
+    assert first.split(",")[columns.index("closed_at")] == ""
+    assert second.split(",")[columns.index("closed_at")] == str(CLOSED_AT)
+
+
+def test_parquet_export_types_closing_date(session, site_id: int, tmp_path: Path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    path = tmp_path / "export.parquet"
+    assert EstablishmentExporter(session, site_id).write_parquet(path) == 2
+    table = pq.read_table(path)
+    assert table.schema.field("closed_at").type == pa.timestamp("us")
+    assert table.column("closed_at").to_pylist() == [None, CLOSED_AT]
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+from sqlmodel import Session
+
+from app.models import Establishment, Site, SiteEstablishment
+from app.services.geocoding import GeocodingService
+
+
+class Service(GeocodingService):
+    def __init__(self, fail_after: int | None = None) -> None:
+        super().__init__()
+        self.calls = 0
+        self.fail_after = fail_after
+
+    async def geocode(self, address, city=None):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise httpx.ConnectError("BAN indisponible")
+        return {"geometry": {"coordinates": [4.83, 45.76]}, "properties": {"score": 0.9}}
+
+
+def _site_with_establishments(session: Session, count: int) -> Site:
+    site = Site(name="Géocodage", slug="geocodage")
+    session.add(site)
+    session.commit()
+    for index in range(count):
+        establishment = Establishment(
+            siren=f"{index:09d}", nic="00012", siret=f"{index:09d}00012", address=f"{index} rue de Lyon"
+        )
+        session.add(establishment)
+        session.commit()
+        session.add(SiteEstablishment(site_id=site.id, establishment_id=establishment.id))
+    session.commit()
+    return site
+
+
+def _geocode(session: Session, service: GeocodingService, site_id: int) -> int:
+    async def scenario() -> int:
+        try:
+            return await service.geocode_site(session, site_id, limit=10)
+        finally:
+            await service.close()
+
+    return asyncio.run(scenario())
+
+
+def test_site_version_is_bumped_once_per_chunk(session: Session):
+    site = _site_with_establishments(session, 3)
+
+    assert _geocode(session, Service(), site.id) == 3
+    session.refresh(site)
+    assert site.data_version == 1
+
+
+def test_ban_error_keeps_addresses_already_geocoded(session: Session):
+    site = _site_with_establishments(session, 3)
+
+    with pytest.raises(httpx.ConnectError):
+        _geocode(session, Service(fail_after=2), site.id)
+    session.refresh(site)
+    assert site.data_version == 1
+    located = [establishment.geo_lat for establishment in session.get(Site, site.id).establishments]
+    assert sorted(located, key=lambda value: value is None) == [45.76, 45.76, None]
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app.models import Establishment, Site
+from app.services.archive import archive_closed_establishments
+from app.services.sirene import SireneImporter
+
+
+def _payload(index: int, active: bool = True) -> dict:
+    return {
+        "siren": f"{index:09d}",
+        "nic": "00012",
+        "siret": f"{index:09d}00012",
+        "etatAdministratifEtablissement": "A" if active else "F",
+        "periodesEtablissement": [{"codePostalEtablissement": "69001", "libelleCommuneEtablissement": "LYON"}],
+    }
+
+
+def test_store_page_reports_the_write_performed(session: Session):
+    first, second = Site(name="Premier", slug="premier"), Site(name="Second", slug="second")
+    session.add_all([first, second])
+    for index in (2, 3):
+        session.add(
+            Establishment(
+                siren=f"{index:09d}",
+                nic="00012",
+                siret=f"{index:09d}00012",
+                is_active=False,
+                closed_at=datetime.utcnow() - timedelta(days=800),
+            )
+        )
+    session.commit()
+    assert archive_closed_establishments(session, timedelta(days=365)) == 2
+
+    importer = SireneImporter()
+    entries = [
+        (importer._map_establishment(_payload(1)), [first.id]),
+        # même SIRET pour un second site dans la même page : une seule insertion
+        (importer._map_establishment(_payload(1)), [second.id]),
+        # archivé et toujours fermé : reste dans l'archive
+        (importer._map_establishment(_payload(2, active=False)), [first.id]),
+        # archivé et rouvert : réintégré dans les tables chaudes
+        (importer._map_establishment(_payload(3)), [first.id]),
+    ]
+    results = [result for _, _, result in importer._store_page(session, entries)]
+    session.commit()
+    assert results == ["inserted", "updated", "archived", "updated"]
+
+    # import suivant : déjà connu et rattaché, l'établissement est seulement mis à jour
+    stored = importer._store_page(session, [(importer._map_establishment(_payload(1)), [first.id])])
+    assert [(linked, result) for _, linked, result in stored] == [(set(), "updated")]
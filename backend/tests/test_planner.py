@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from sqlmodel import Session
+
+from app.models import ImportJob, Site
+from app.services.planner import (
+    _merge_key,
+    claim_imports,
+    covers,
+    parse_filters,
+    pending_imports,
+    plan_imports,
+)
+
+
+def _payload(naf: str, postal_code: str, commune: str = "75056") -> dict:
+    return {
+        "activitePrincipaleEtablissement": naf,
+        "periodesEtablissement": [
+            {"codePostalEtablissement": postal_code, "codeCommuneEtablissement": commune},
+        ],
+    }
+
+
+def _target(site_id: int, job_id: int, **filters: str) -> tuple[ImportJob, Site]:
+    site = Site(id=site_id, name=f"site {site_id}", slug=f"site-{site_id}", sirene_filters=filters)
+    return ImportJob(id=job_id, site_id=site_id), site
+
+
+def test_parse_filters_normalizes_naf_codes():
+    filters = parse_filters({"codeNaf": "4322a, 43.21A", "codePostalEtablissement": "75001"})
+    assert filters == {
+        "codeNaf": frozenset({"43.22A", "43.21A"}),
+        "codePostalEtablissement": frozenset({"75001"}),
+    }
+
+
+def test_covers():
+    general = {"codeNaf": frozenset({"43.22A", "43.21A"})}
+    specific = {"codeNaf": frozenset({"43.22A"}), "codePostalEtablissement": frozenset({"75001"})}
+    assert covers(general, specific)
+    assert not covers(specific, general)
+    assert covers(general, general)
+
+
+def test_merge_key():
+    first = {"codeNaf": frozenset({"43.22A"}), "codePostalEtablissement": frozenset({"75001"})}
+    second = {"codeNaf": frozenset({"43.22A"}), "codePostalEtablissement": frozenset({"75002"})}
+    third = {"codeNaf": frozenset({"43.21A"}), "codePostalEtablissement": frozenset({"75002"})}
+    assert _merge_key(first, second) == "codePostalEtablissement"
+    assert _merge_key(first, third) is None
+    assert _merge_key(first, {"codeNaf": frozenset({"43.22A"})}) is None
+
+
+def test_plan_imports_merges_sites_differing_by_one_criterion():
+    plans = plan_imports(
+        [
+            _target(1, 1, codeNaf="43.22A", codePostalEtablissement="75001"),
+            _target(2, 2, codeNaf="43.22A", codePostalEtablissement="75002"),
+        ]
+    )
+    assert len(plans) == 1
+    assert plans[0].params["codePostalEtablissement"] == "75001,75002"
+    assert [job.id for job in plans[0].jobs] == [1, 2]
+
+
+def test_plan_imports_absorbs_covered_filters():
+    plans = plan_imports(
+        [
+            _target(1, 1, codeNaf="43.22A"),
+            _target(2, 2, codeNaf="43.22A", codePostalEtablissement="69001"),
+        ]
+    )
+    assert len(plans) == 1
+    assert "codePostalEtablissement" not in plans[0].params
+
+
+def test_plan_imports_keeps_unrelated_queries_apart():
+    plans = plan_imports(
+        [
+            _target(1, 1, codeNaf="43.22A", codePostalEtablissement="75001"),
+            _target(2, 2, codeNaf="56.10A", codePostalEtablissement="69001"),
+        ]
+    )
+    assert len(plans) == 2
+
+
+def test_route_dispatches_to_matching_sites():
+    (plan,) = plan_imports(
+        [
+            _target(1, 1, codeNaf="43.22A", codePostalEtablissement="75001"),
+            _target(2, 2, codeNaf="43.22A", codePostalEtablissement="75002"),
+        ]
+    )
+    assert [site.id for _, site in plan.route(_payload("43.22A", "75002"))] == [2]
+    assert plan.route(_payload("43.22A", "75003")) == []
+
+
+def test_route_single_target_takes_everything():
+    (plan,) = plan_imports([_target(1, 1, codeNaf="43.22A")])
+    assert [site.id for _, site in plan.route(_payload("56.10A", "13001"))] == [1]
+
+
+def test_claim_imports_skips_jobs_already_claimed(session: Session):
+    site = Site(name="Plombiers", slug="plombiers", sirene_filters={"codeNaf": "43.22A"})
+    session.add(site)
+    session.commit()
+    session.add_all([ImportJob(site_id=site.id), ImportJob(site_id=site.id)])
+    session.commit()
+
+    targets = pending_imports(session)
+    first_job = targets[0][0]
+    session.get(ImportJob, first_job.id).status = "running"
+    session.commit()
+
+    claimed = claim_imports(session, targets)
+    assert [job.id for job, _ in claimed] == [targets[1][0].id]
+    assert claimed[0][0].status == "running"
+    assert claim_imports(session, targets) == []
+    assert pending_imports(session) == []
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.services import progress
+from app.services.progress import ImportProgressBroker
+
+
+async def _collect(stream, count: int) -> list:
+    items = []
+    async for item in stream:
+        items.append(item)
+        if len(items) == count:
+            break
+    return items
+
+
+def test_published_progress_reaches_subscribers():
+    broker = ImportProgressBroker()
+
+    async def scenario():
+        stream = broker.subscribe(1, {"job_id": 1, "status": "pending", "done": False})
+        first = await stream.__anext__()
+        broker.publish(1, status="running", done=False)
+        second = await stream.__anext__()
+        broker.publish(1, status="completed", done=True)
+        rest = await _collect(stream, 10)
+        return [first, second, *rest]
+
+    states = asyncio.run(scenario())
+    assert [state["status"] for state in states] == ["pending", "running", "completed"]
+
+
+def test_jobs_run_elsewhere_are_reloaded_from_the_database(monkeypatch):
+    monkeypatch.setattr(progress, "POLL_SECONDS", 0.01)
+    broker = ImportProgressBroker()
+    rows = iter(
+        [
+            {"job_id": 1, "status": "running", "total_imported": 0, "done": False},
+            {"job_id": 1, "status": "running", "total_imported": 0, "done": False},
+            {"job_id": 1, "status": "running", "total_imported": 500, "done": False},
+            {"job_id": 1, "status": "completed", "total_imported": 800, "done": True},
+        ]
+    )
+
+    async def reload():
+        return next(rows)
+
+    initial = {"job_id": 1, "status": "pending", "total_imported": 0, "done": False}
+    states = asyncio.run(_collect(broker.subscribe(1, initial, reload=reload), 10))
+    assert [(state["status"], state["total_imported"]) for state in states] == [
+        ("pending", 0),
+        ("running", 0),
+        ("running", 500),
+        ("completed", 800),
+    ]
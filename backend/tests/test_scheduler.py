@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlmodel import select
+
+from app.config import Settings
+from app.database import get_session, init_db
+from app.models import ImportJob, SireneUsage, Site
+from app.routers import imports as imports_router
+from app.services import scheduler
+from app.services.scheduler import (
+    SiteRefresh,
+    available_requests,
+    fail_stale_imports,
+    plan_refreshes,
+    refresh_candidates,
+)
+
+NOW = datetime(2024, 6, 1, 12, 0)
+INTERVAL = timedelta(hours=24)
+
+
+def _site(site_id: int, hours_ago: float | None, requests: int = 1) -> SiteRefresh:
+    refreshed_at = None if hours_ago is None else NOW - timedelta(hours=hours_ago)
+    return SiteRefresh(site_id, refreshed_at, requests * 1000, requests)
+
+
+def _plan(candidates: list[SiteRefresh], budget: int, hourly_quota: int = 100) -> list[int]:
+    return [refresh.site_id for refresh in plan_refreshes(candidates, NOW, INTERVAL, budget, hourly_quota)]
+
+
+def test_recent_sites_wait():
+    assert _plan([_site(1, 2), _site(2, 17)], budget=10) == []
+
+
+def test_early_refresh_from_three_quarters_of_interval():
+    assert _plan([_site(1, 19)], budget=10) == [1]
+
+
+def test_overdue_and_never_imported_sites_come_first():
+    candidates = [_site(1, 20), _site(2, 30), _site(3, None), _site(4, 48)]
+    assert _plan(candidates, budget=10) == [3, 4, 2, 1]
+    assert _plan(candidates, budget=2) == [3, 4]
+
+
+def test_sites_that_do_not_fit_leave_room_for_smaller_ones():
+    candidates = [_site(1, 40, requests=8), _site(2, 30, requests=3), _site(3, 26, requests=2)]
+    assert _plan(candidates, budget=5) == [2, 3]
+
+
+def test_site_larger_than_hourly_quota_needs_an_untouched_hour():
+    candidates = [_site(1, 48, requests=150)]
+    assert _plan(candidates, budget=100, hourly_quota=100) == [1]
+    assert _plan(candidates, budget=99, hourly_quota=100) == []
+    assert _plan(candidates + [_site(2, 30)], budget=100, hourly_quota=100) == [1]
+
+
+def test_empty_budget_plans_nothing():
+    assert _plan([_site(1, None)], budget=0) == []
+
+
+def test_failed_imports_count_as_attempts(session):
+    sites = [
+        Site(name=f"site {index}", slug=f"site-{index}", sirene_filters={"codeNaf": "43.22A"}) for index in range(3)
+    ]
+    session.add_all(sites)
+    session.commit()
+    session.add_all(
+        [
+            ImportJob(
+                site_id=sites[0].id, status="completed", pages_processed=9, updated_at=NOW - timedelta(hours=60)
+            ),
+            ImportJob(
+                site_id=sites[0].id, status="completed", pages_processed=4, updated_at=NOW - timedelta(hours=30)
+            ),
+            ImportJob(site_id=sites[0].id, status="failed", updated_at=NOW - timedelta(hours=1)),
+            ImportJob(site_id=sites[1].id, status="failed", updated_at=NOW - timedelta(hours=2)),
+            ImportJob(site_id=sites[2].id, status="running"),
+        ]
+    )
+    session.commit()
+
+    candidates = {refresh.site_id: refresh for refresh in refresh_candidates(session, Settings())}
+    assert set(candidates) == {sites[0].id, sites[1].id}
+    assert candidates[sites[0].id].last_attempt_at == NOW - timedelta(hours=1)
+    assert candidates[sites[0].id].estimated_requests == 4
+    assert _plan(list(candidates.values()), budget=10) == []
+
+
+
+def test_interrupted_imports_no_longer_block_their_site(session):
+    sites = [
+        Site(name=f"site {index}", slug=f"site-{index}", sirene_filters={"codeNaf": "43.22A"}) for index in range(2)
+    ]
+    session.add_all(sites)
+    session.commit()
+    orphan = ImportJob(site_id=sites[0].id, status="running", updated_at=NOW - timedelta(hours=3))
+    session.add_all([orphan, ImportJob(site_id=sites[1].id, status="running", updated_at=NOW - timedelta(minutes=5))])
+    session.commit()
+
+    assert fail_stale_imports(session, NOW, timedelta(hours=1)) == 1
+    session.commit()
+    session.refresh(orphan)
+    assert orphan.status == "failed"
+    candidates = refresh_candidates(session, Settings())
+    assert [(refresh.site_id, refresh.last_attempt_at) for refresh in candidates] == [
+        (sites[0].id, NOW - timedelta(hours=3))
+    ]
+
+def test_available_requests_reads_recorded_usage(session):
+    settings = Settings(sirene_daily_quota=2400)
+    session.add_all(
+        [
+            SireneUsage(recorded_at=NOW - timedelta(minutes=10), requests=30),
+            SireneUsage(recorded_at=NOW - timedelta(hours=3), requests=500),
+            SireneUsage(recorded_at=NOW - timedelta(days=2), requests=5000),
+            # les jobs ne comptent plus : leurs pages cumulées surestimaient la consommation
+            ImportJob(site_id=1, status="completed", pages_processed=1000, updated_at=NOW),
+        ]
+    )
+    session.commit()
+    assert available_requests(session, settings, NOW) == 100 - 30
+    session.add(SireneUsage(recorded_at=NOW - timedelta(hours=2), requests=1850))
+    session.commit()
+    assert available_requests(session, settings, NOW) == 2400 - 2380
+
+
+def test_job_created_while_the_runner_closes_is_imported(monkeypatch):
+    init_db()
+    with get_session() as session:
+        site = Site(name="Réveil", slug="reveil", sirene_filters={"codeNaf": "43.22A"})
+        session.add(site)
+        session.commit()
+        session.add(ImportJob(site_id=site.id))
+        session.commit()
+        site_id = site.id
+    imported: list[int] = []
+
+    class Importer:
+        closed = 0
+
+        async def import_planned(self, session, plan):
+            for job in plan.jobs:
+                job.status = "completed"
+                session.add(job)
+                imported.append(job.id)
+            session.commit()
+            return plan.jobs
+
+        async def close(self):
+            Importer.closed += 1
+            if Importer.closed == 1:
+                # le job arrive pendant la fermeture : le réveil trouve le traitement encore en cours
+                with get_session() as session:
+                    job = ImportJob(site_id=site_id)
+                    session.add(job)
+                    session.commit()
+                    await imports_router.schedule_import_job(job.id)
+                await asyncio.sleep(0)
+
+    monkeypatch.setattr(scheduler, "SireneImporter", Importer)
+    monkeypatch.setattr(scheduler, "_start_geocoding", lambda site_id, job_id: None)
+
+    async def scenario() -> None:
+        imports_router._import_runner = asyncio.create_task(scheduler.run_pending_imports(window_seconds=0))
+        await imports_router._import_runner
+
+    asyncio.run(scenario())
+    imports_router._import_runner = None
+
+    assert len(imported) == 2
+    with get_session() as session:
+        assert session.exec(select(ImportJob).where(ImportJob.status == "pending")).all() == []
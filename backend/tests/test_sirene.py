@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.services.sirene import IncrementalPageParser, parse_page_incrementally
+
+pytest.importorskip("ijson")
+
+
+def _establishment(index: int) -> dict:
+    return {
+        "siren": f"{index:09d}",
+        "nic": "00012",
+        "siret": f"{index:09d}00012",
+        "etatAdministratifEtablissement": "A",
+        "activitePrincipaleEtablissement": "43.22A",
+        "uniteLegale": {"denominationUniteLegale": f"PLOMBERIE {index}", "sigleUniteLegale": "PLB"},
+        "adresseEtablissement": {"libelleVoieEtablissement": "ignorée"},
+        "periodesEtablissement": [
+            {"codePostalEtablissement": "69001", "libelleCommuneEtablissement": "LYON", "dateFin": None},
+            {"codePostalEtablissement": "75001", "libelleCommuneEtablissement": "PARIS", "dateDebut": "2020-01-01"},
+        ],
+    }
+
+
+def test_parse_page_keeps_mapped_fields_and_last_period():
+    page = {
+        "header": {"total": 2, "curseurSuivant": "ignoré"},
+        "etablissements": [_establishment(1), _establishment(2)],
+        "curseurSuivant": "AoE",
+    }
+    body = json.dumps(page).encode()
+
+    etablissements, cursor = parse_page_incrementally(body)
+
+    assert cursor == "AoE"
+    assert [item["siret"] for item in etablissements] == ["00000000100012", "00000000200012"]
+    first = etablissements[0]
+    assert first["uniteLegale"] == {"denominationUniteLegale": "PLOMBERIE 1"}
+    assert "adresseEtablissement" not in first
+    assert first["periodesEtablissement"] == [
+        {"codePostalEtablissement": "75001", "libelleCommuneEtablissement": "PARIS"}
+    ]
+
+
+def test_parse_page_without_cursor_or_periods():
+    establishment = _establishment(3)
+    establishment["periodesEtablissement"] = []
+    etablissements, cursor = parse_page_incrementally(json.dumps({"etablissements": [establishment]}).encode())
+    assert cursor is None
+    assert etablissements[0]["periodesEtablissement"] == []
+
+
+def test_parser_accepts_arbitrary_chunks():
+    page = {"etablissements": [_establishment(index) for index in range(20)], "curseurSuivant": "B"}
+    body = json.dumps(page).encode()
+    parser = IncrementalPageParser()
+    for start in range(0, len(body), 7):
+        parser.feed(body[start : start + 7])
+    etablissements, cursor = parser.close()
+    assert (etablissements, cursor) == parse_page_incrementally(body)
+    assert len(etablissements) == 20
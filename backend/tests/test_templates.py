@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import pytest
+
+from app.services.templates import CompiledTemplate, TemplateError, compile_template
+
+VARIABLES = {"ville": "Lyon", "nombre_etablissements": 42, "departement": "69"}
+
+
+def test_variables_are_declared_once_in_order():
+    template = CompiledTemplate("{ville} ({departement}) : {nombre_etablissements} pros à {ville}")
+    assert template.variables == ("ville", "departement", "nombre_etablissements")
+    assert template.missing(["ville"]) == ["departement", "nombre_etablissements"]
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "Artisans de {ville}",
+        "{nombre_etablissements:>5} à {ville!r} ({departement})",
+        "100 % {ville}, {{littéral}}",
+        "sans variable",
+        "{nombre_etablissements:.1f}",
+    ],
+)
+def test_render_matches_str_format(source: str):
+    assert CompiledTemplate(source).render(VARIABLES) == source.format(**VARIABLES)
+
+
+def test_render_reports_missing_variables():
+    with pytest.raises(TemplateError, match="site"):
+        CompiledTemplate("{site} à {ville}").render(VARIABLES)
+
+
+@pytest.mark.parametrize("source", ["{0}", "{ville.upper}", "{ville!x}", "{ville:{largeur}}", "{ville"])
+def test_invalid_templates_are_rejected(source: str):
+    with pytest.raises(TemplateError):
+        CompiledTemplate(source)
+
+
+def test_invalid_format_spec_raises_template_error():
+    with pytest.raises(TemplateError, match="ville"):
+        CompiledTemplate("{ville:d}").render(VARIABLES)
+
+
+def test_render_many_reports_row_number():
+    template = compile_template("{ville}")
+    rows = [{"ville": "Lyon"}, {"ville": "Nantes"}, {}]
+    rendered = template.render_many(rows)
+    assert next(rendered) == "Lyon"
+    assert next(rendered) == "Nantes"
+    with pytest.raises(TemplateError, match="Ligne 2"):
+        next(rendered)
+
+
+def test_compile_template_is_cached():
+    assert compile_template("{ville}") is compile_template("{ville}")
@@ -36,6 +36,12 @@ export function EstablishmentsMap({ siteId }: Props) {
               {establishment.postal_code} {establishment.city}
               <br />
               {establishment.is_active ? "Actif" : establishment.closure_label}
+              {establishment.geo_status === "centroid" && (
+                <>
+                  <br />
+                  <em>Position approximative (centre de la commune)</em>
+                </>
+              )}
             </Popup>
           </Marker>
         ))}
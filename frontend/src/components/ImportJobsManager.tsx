@@ -1,12 +1,56 @@
-import { FormEvent, useState } from "react";
+import { FormEvent, useEffect, useState } from "react";
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 
-import { ImportJob, api } from "../lib/api";
+import { ImportJob, ImportProgress, api, subscribeImportProgress } from "../lib/api";
 
 interface Props {
   siteId: number;
 }
 
+const FINISHED_STATUSES = ["completed", "failed"];
+// la progression arrive par SSE ; ce rafraîchissement lent fait apparaître les imports lancés
+// par le planificateur ou un autre worker
+const JOBS_REFETCH_INTERVAL_MS = 30_000;
+
+function ImportJobProgress({ siteId, job }: { siteId: number; job: ImportJob }) {
+  const queryClient = useQueryClient();
+  const [progress, setProgress] = useState<ImportProgress | null>(null);
+  // suivi décidé à l'affichage : un import terminé d'après la liste peut encore géocoder, son
+  // flux n'est fermé qu'à l'événement final du serveur
+  const [streaming, setStreaming] = useState(() => !FINISHED_STATUSES.includes(job.status));
+
+  useEffect(() => {
+    if (!streaming) {
+      return undefined;
+    }
+    return subscribeImportProgress(siteId, job.id, setProgress, () => {
+      setStreaming(false);
+      queryClient.invalidateQueries({ queryKey: ["imports", siteId] });
+    });
+  }, [siteId, job.id, streaming, queryClient]);
+
+  const status = progress?.status ?? job.status;
+  return (
+    <div>
+      <h3>Import #{job.id}</h3>
+      <p>Statut : {status}</p>
+      <p>Entreprises importées : {progress?.total_imported ?? job.total_imported}</p>
+      <p>Etablissements fermés : {progress?.total_closed ?? job.total_closed}</p>
+      {progress?.rows_per_second !== undefined && (
+        <p>
+          Pages : {progress.pages ?? 0} ({progress.rows_per_second.toFixed(1)} lignes/s)
+        </p>
+      )}
+      {progress?.geocoding && (
+        <p>
+          Géocodage : {progress.geocoded ?? 0} adresses ({(progress.geocodes_per_second ?? 0).toFixed(1)}/s)
+        </p>
+      )}
+      {(progress?.last_error ?? job.last_error) && <p>Erreur : {progress?.last_error ?? job.last_error}</p>}
+    </div>
+  );
+}
+
 export function ImportJobsManager({ siteId }: Props) {
   const queryClient = useQueryClient();
   const { data: jobs } = useQuery({
@@ -15,7 +59,7 @@ export function ImportJobsManager({ siteId }: Props) {
       const { data } = await api.get<ImportJob[]>(`/sites/${siteId}/imports`);
       return data;
     },
-    refetchInterval: 3000
+    refetchInterval: JOBS_REFETCH_INTERVAL_MS
   });
 
   const [naf, setNaf] = useState("");
@@ -61,13 +105,7 @@ export function ImportJobsManager({ siteId }: Props) {
       </form>
       <div className="flex-column" style={{ marginTop: "1.5rem" }}>
         {jobs?.map((job) => (
-          <div key={job.id}>
-            <h3>Import #{job.id}</h3>
-            <p>Statut : {job.status}</p>
-            <p>Entreprises importées : {job.total_imported}</p>
-            <p>Etablissements fermés : {job.total_closed}</p>
-            {job.last_error && <p>Erreur : {job.last_error}</p>}
-          </div>
+          <ImportJobProgress key={job.id} siteId={siteId} job={job} />
         ))}
       </div>
     </div>
@@ -110,6 +110,7 @@ export function PromptManager({ siteId }: Props) {
             {prompts?.map((item) => (
               <option key={item.id} value={item.id}>
                 {item.label}
+                {item.variables?.length ? ` (${item.variables.join(", ")})` : ""}
               </option>
             ))}
           </select>
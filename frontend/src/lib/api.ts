@@ -40,6 +40,7 @@ export interface Establishment {
   department?: string;
   is_active: boolean;
   closure_label?: string;
+  closed_at?: string;
   geo_lat?: number;
   geo_lon?: number;
   geo_status?: string;
@@ -59,6 +60,71 @@ export interface ImportJob {
   total_closed: number;
   total_errors: number;
   last_error?: string;
+  profile: boolean;
+  rate_limit_seconds: number;
+  http_seconds: number;
+  parse_seconds: number;
+  upsert_seconds: number;
+  commit_seconds: number;
+  geocode_seconds: number;
+  elapsed_seconds: number;
+  pages_processed: number;
+  rows_processed: number;
+  pages_per_second: number;
+  rows_per_second: number;
+  profile_path?: string;
+}
+
+export interface ImportProgress {
+  job_id: number;
+  site_id?: number;
+  status?: string;
+  cursor?: string;
+  total_imported?: number;
+  total_closed?: number;
+  total_errors?: number;
+  last_error?: string;
+  pages?: number;
+  rows_per_second?: number;
+  geocoding?: string;
+  geocoded?: number;
+  geocodes_per_second?: number;
+  done?: boolean;
+}
+
+const FINISHED_IMPORT_STATUSES = ["completed", "failed"];
+
+// le flux reste ouvert jusqu'à l'événement `done` envoyé par le serveur, après le géocodage :
+// le statut `completed` de l'import arrive avant
+export function subscribeImportProgress(
+  siteId: number,
+  jobId: number,
+  onProgress: (progress: ImportProgress) => void,
+  onEnd?: () => void
+): () => void {
+  const source = new EventSource(`${api.defaults.baseURL}/sites/${siteId}/imports/${jobId}/events`);
+  let lastStatus: string | undefined;
+  const end = () => {
+    source.close();
+    onEnd?.();
+  };
+  source.addEventListener("progress", (event) => {
+    const progress = JSON.parse((event as MessageEvent<string>).data) as ImportProgress;
+    lastStatus = progress.status ?? lastStatus;
+    onProgress(progress);
+    if (progress.done) {
+      end();
+    }
+  });
+  // EventSource se reconnecte seul tant que l'import tourne ; une erreur après un statut final
+  // (ou un flux refusé) met fin au suivi
+  source.addEventListener("error", () => {
+    const finished = lastStatus !== undefined && FINISHED_IMPORT_STATUSES.includes(lastStatus);
+    if (source.readyState === EventSource.CLOSED || finished) {
+      end();
+    }
+  });
+  return () => source.close();
 }
 
 export interface PromptTemplate {
@@ -67,6 +133,7 @@ export interface PromptTemplate {
   label: string;
   prompt: string;
   scope: string;
+  variables?: string[];
   created_at: string;
 }
 